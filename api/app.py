@@ -1,12 +1,76 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import base64
+import json
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import date, datetime, timezone
-from database import users, users_id, tasks, tasks_id, events, events_id, transactions, transactions_id,jars, jars_id, budget, achievements, dtypes, dtypes_id
-from models_database import Event, Task, Transaction, User, Jar, Type
-from models_request import UserRequest, TaskRequest, EventRequest, TransactionRequest, JarRequest, JarUpdateDeadlineRequest,JarUpdateAmountRequest, TypeRequest, BudgetRequest
+from fastapi.requests import HTTPConnection
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from datetime import date, datetime, timedelta, timezone
+from database import as_utc, changes, create_family, families, family, family_exists, family_local, ids, refresh, reminders, storage, use_family, state, users, tasks, events, transactions, jars, achievements, dtypes
+from models_database import Event, Task, Transaction, User, Jar, Type, id_tuple
+from models_request import UserRequest, TaskRequest, EventRequest, TransactionRequest, TransactionImportRequest, BatchOperation, BatchRequest, JarRequest, JarUpdateDeadlineRequest,JarUpdateAmountRequest, TypeRequest, BudgetRequest
 from collections import defaultdict
+from live import Hub, Subscriber
+from metrics import Gauge, LoopLag, MetricsMiddleware, Registry
+from profiling import ProfileMiddleware, Profiler
+from recurrence import task_rule
+from serializers import embed, embedded_users, encode_event, encode_jar, encode_task, encode_transaction, format_event, format_jar, format_user, format_transaction, jar_row, json_response
+from store import Table
+from transfer import FORMATS, pick_format, read_records, write_records
+from pydantic import ValidationError
+
+def versioned(*collections):
+    #GET handler built only from these collections: same versions, same response
+    def register(handler):
+        handler.collections = collections
+        return handler
+    return register
+
+def collections_etag(collections, request: Request) -> str:
+    #Collections with version_for() depend on the request, e.g. on a defaulted time window
+    versions = (collection.version_for(request) if hasattr(collection, "version_for") else collection.version for collection in collections)
+    return '"' + "-".join([family.instance, *map(str, versions)]) + '"'
+
+class VersionedRoute(APIRoute):
+    #Answers If-None-Match with 304 before the handler runs, adds the ETag otherwise
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        collections = getattr(self.endpoint, "collections", None)
+        if collections is None:
+            return handler
+
+        async def versioned_handler(request: Request) -> Response:
+            etag = collections_etag(collections, request)
+            matches = {tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")}
+            if etag in matches or "*" in matches:
+                return Response(status_code=304, headers={"ETag": etag, "Vary": "X-Family-Id"})
+            response = await handler(request)
+            response.headers["ETag"] = etag
+            response.headers["Vary"] = "X-Family-Id"
+            return response
+        return versioned_handler
+
+class CurrentMonth:
+    #Statistics default to the current month, so they change with it
+    @property
+    def version(self) -> int:
+        now = datetime.now()
+        return now.year * 12 + now.month
+
+current_month = CurrentMonth()
+
+class DefaultWindow:
+    #Time windows that start now when the request has no start, so they move every minute
+    def version_for(self, request: Request) -> int:
+        return 0 if request.query_params.get("start") else int(datetime.now(timezone.utc).timestamp() // 60)
+
+default_window = DefaultWindow()
 
 app = FastAPI()
+app.router.route_class = VersionedRoute
 
 origins = [
     "*",
@@ -20,37 +84,165 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def family_id(connection: HTTPConnection) -> int:
+    #X-Family-Id header, or ?family= where headers can't be set (EventSource, WebSocket)
+    value = connection.headers.get("x-family-id") or connection.query_params.get("family") or "1"
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(value)
+    return int(value)
+
+#Every request works on one family. Requests that change data run one at a time per
+#family and worker, and inside a storage write transaction so other workers wait too
+@app.middleware("http")
+async def storage_session(request, call_next):
+    reminders.start()
+    if request.url.path.startswith("/families/"):
+        #Creating a family happens before there is one to work on
+        return await call_next(request)
+    try:
+        use_family(family_id(request))
+    except ValueError:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": {"error": "InvalidFamily", "message": "Failed: family id must be a positive number"}}
+        )
+    except LookupError:
+        return JSONResponse(
+            status_code=404,
+            content={"detail": {"error": "UnknownFamily", "message": "Failed: family does not exist, create it with POST /families/{id}"}}
+        )
+    if request.method in ("GET", "HEAD", "OPTIONS") or request.url.path in unlocked_paths:
+        refresh_live()
+        return await call_next(request)
+    #The whole body arrives before the lock is taken, a slow client holds up nobody else
+    await request.body()
+    async with writing():
+        response = await call_next(request)
+    return response
+
+#Streamed uploads take the write lock per batch themselves, not for the whole upload
+unlocked_paths = {"/transactions/import"}
+
+@asynccontextmanager
+async def writing():
+    #One write to the current family: its lock and a storage transaction, then the
+    #changes go out to live subscribers
+    async with family.write_lock:
+        storage.begin()
+        try:
+            refresh_live()
+            seq = changes.seq
+            yield
+        except BaseException:
+            #Nothing of a failed request is kept, subscribers resync to the reloaded tables
+            if family.rollback() and hub:
+                hub.broadcast(resync_message())
+            raise
+        storage.commit()
+        await publish(seq)
+
+#Requests carrying PROFILE_TOKEN in X-Profile (or ?profile=) run under cProfile,
+#without the variable the middleware isn't installed at all
+profile_token = os.environ.get("PROFILE_TOKEN")
+profiler = Profiler(profile_token) if profile_token else None
+if profiler:
+    app.add_middleware(ProfileMiddleware, profiler=profiler)
+
+#Added last so it is the outermost middleware and times everything above, profiling included
+registry = Registry()
+loop_lag = LoopLag()
+app.add_middleware(MetricsMiddleware, registry=registry, loop_lag=loop_lag)
+
+
+def jar_history(jarId: int, limit: int | None = None) -> list[Transaction]:
+    #Oldest first; with a limit only the newest ones are kept
+    if limit is None:
+        return transactions.lookup("jar", jarId)
+    return transactions.lookup("jar", jarId, limit, reverse=True)[::-1]
+
+page_size = 50
+
+def check_limit(limit: int | None, name: str = "limit"):
+    if limit is not None and limit < 1:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "InvalidLimit", "message": f"Failed: {name} must be at least 1"}
+        )
+
+def encode_cursor(order: tuple) -> str:
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in order]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return tuple(datetime.fromisoformat(value) if isinstance(value, str) else value for value in values)
+
+def read_page(table: Table, index: str, key, limit: int | None, cursor: str | None, reverse: bool = False) -> tuple[list, str | None]:
+    #Keyset page: the cursor is the sort key of the last row already sent
+    check_limit(limit)
+    limit = limit or page_size
+    try:
+        rows = table.lookup(index, key, limit + 1, decode_cursor(cursor) if cursor else None, reverse)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "InvalidCursor", "message": "Failed: cursor is not valid"}
+        )
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor(table.indexes[index].order(rows[limit - 1]))
+
+
+#*------------*FAMILY ENDPOINTS*------------*
+@app.post("/families/{familyId}")
+async def add_family(familyId: int):
+    if familyId < 1:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "InvalidFamily", "message": "Failed: family id must be a positive number"}
+        )
+    if family_exists(familyId):
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "FamilyExists", "message": "Failed: family already exists"}
+        )
+    try:
+        create_family(familyId)
+    except ValueError:
+        #Created by a parallel request
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "FamilyExists", "message": "Failed: family already exists"}
+        )
+    except OverflowError:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "TooManyFamilies", "message": "Failed: no room for more families in this worker"}
+        )
+    return {"id": familyId}
+
+
 #*------------*USER ENDPOINTS*------------*
 @app.get("/users_all")
+@versioned(users)
 async def get_users():
-    return users
+    return users.all()
 
 
 @app.get("/user/{userId}")
+@versioned(users)
 async def get_user(userId: int):
-    user = next((u for u in users if u.id == userId), None)
+    user = users.get(userId)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    formatted_user = {
-        "id": user.id,
-        "avatar_id": user.avatar_id,
-        "name": user.name,
-        "surname": user.surname,
-        "role": user.role,
-        "dob": user.dob.strftime("%d.%m.%Y"),
-        "done_tasks": user.done_tasks,
-        "created_events": user.created_events,
-        "created_tasks": user.created_tasks,
-        "has_achievement": user.has_achievement,
-    }
 
-    return formatted_user
+    return format_user(user)
 
 
 @app.get("/user/achievements/{userId}")
+@versioned(users)
 async def get_user_achievements(userId: int):
-    user = next((u for u in users if u.id == userId), None)
+    user = users.get(userId)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     user_achievements = [achievement for achievement in achievements if achievement.id in user.has_achievement]
@@ -59,89 +251,112 @@ async def get_user_achievements(userId: int):
 
 @app.post("/user/add")
 async def add_user(user_inf: UserRequest):
-    global users_id
     user = User(
-        id= users_id,
+        id=ids.next("users_id"),
         avatar_id = user_inf.avatar_id,
         name=user_inf.name,
         surname=user_inf.surname,
         role=user_inf.role,
         dob=user_inf.dob)
-    users_id = users_id + 1
-    users.append(user)
+    users.add(user)
     return user
 
 @app.put("/user/{userId}/avatar/{avatarId}")
 async def avatar_user(userId: int, avatarId: str):
-    user = next((u for u in users if u.id == userId), None)
+    user = users.get(userId)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     user.avatar_id = avatarId
+    users.update(user)
     return user
 
 #*------------*TASK ENPOINTS*------------*
 @app.get("/tasks/{userId}")
-async def get_tasks_user(userId: int, filter: str = None):
-    userId_tasks = [task for task in tasks if ((userId in task.participating) or (task.created_by == userId)) and task.done == False]
+@versioned(tasks, users)
+async def get_tasks_user(userId: int, filter: str = None, limit: int | None = None, embed_users: bool = False):
+    check_limit(limit)
     return_task = []
 
     #No filter or deadline
     if filter == None or filter == "" or filter == "deadline":
-        for task in userId_tasks:
-            if task.deadline.tzinfo is None:
-                task.deadline = task.deadline.replace(tzinfo=timezone.utc)
-        filtered_tasks = [task for task in userId_tasks]
-        return_task = sorted(filtered_tasks, key=lambda t: t.deadline)
+        return_task = tasks.lookup("deadline", userId, limit)
     #Filter priority
     elif filter == "priority":
-        return_task = sorted(userId_tasks, key=lambda t: t.priority, reverse=True)
+        return_task = tasks.lookup("priority", userId, limit)
     #Filter done
     elif filter == "done":
-        return_task = [task for task in tasks if task.done == True]
-
-    formatted_tasks = [
-        {
-            "id": task.id,
-            "name": task.name,
-            "description": task.description,
-            "datecreation": task.datecreation.strftime("%d.%m.%Y"),
-            "deadline": task.deadline.strftime("%d.%m.%Y %H:%M"),
-            "priority": task.priority,
-            "repeatable": task.repeatable,
-            "repeatabletype": task.repeatabletype,
-            "participating": task.participating,
-            "done": task.done,
-            "created_by": task.created_by,
-            "from": next((u.name for u in users if u.id == task.created_by), "Unknown")
-        }
-        for task in return_task
-    ]
-    return formatted_tasks
+        return_task = tasks.lookup("done", True, limit)
+
+    formatted_tasks = [encode_task(task) for task in return_task]
+    if embed_users:
+        return json_response({"tasks": formatted_tasks, "users": embedded_users(return_task)})
+    return json_response(formatted_tasks)
+
+
+@app.get("/tasks/{userId}/occurrences")
+@versioned(tasks, users, default_window)
+async def get_task_occurrences(userId: int, start: datetime | None = None, end: datetime | None = None, limit: int | None = None):
+    #Deadlines of the user's open tasks in [start, end), every occurrence of repeating ones.
+    #Wall clock times like the task list shows, from now for a week by default.
+    start = start.replace(tzinfo=None) if start else datetime.now(timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+    end = end.replace(tzinfo=None) if end else start + timedelta(days=7)
+    if end <= start:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "InvalidRange", "message": "Failed: end must be after start"}
+        )
+    check_limit(limit)
+    occurrences = tasks.indexes["schedule"].between(userId, start, end, limit)
+    return json_response([{"deadline": moment.strftime("%d.%m.%Y %H:%M"), "task": encode_task(tasks.get(id))} for moment, id in occurrences])
 
 
 @app.get("/task/{taskId}")
+@versioned(tasks, users)
 async def get_task(taskId: int):
-    task = next((t for t in tasks if t.id == taskId), None)
+    task = tasks.get(taskId)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    creator_name = next((u.name for u in users if u.id == task.created_by), "Unknown")
-
-    formatted_task = {
-        "id": task.id,
-        "name": task.name,
-        "description": task.description,
-        "datecreation": task.datecreation.strftime("%d.%m.%Y"),
-        "deadline": task.deadline.strftime("%d.%m.%Y %H:%M"),
-        "priority": task.priority,
-        "repeatable": task.repeatable,
-        "repeatabletype": task.repeatabletype,
-        "participating": task.participating,
-        "done": task.done,
-        "created_by": task.created_by,
-        "from": creator_name
-    }
-    return formatted_task
+    return json_response(encode_task(task))
+
+def new_task(task_inf: TaskRequest, userId: int) -> Task:
+    repeatable = task_inf.repeatable or task_inf.repeatabletype in {1, 2, 3}
+    return Task(
+        id=ids.next("tasks_id"),
+        name=task_inf.name,
+        description=task_inf.description,
+        datecreation=date.today(),
+        deadline=task_inf.deadline,
+        priority=task_inf.priority,
+        repeatable=repeatable,
+        repeatabletype=task_inf.repeatabletype,
+        participating=task_inf.participating,
+        done=False,
+        created_by=userId)
+
+def edit_task(task: Task, task_inf: TaskRequest) -> Task:
+    # Update the task details with the new information
+    task.name = task_inf.name
+    task.description = task_inf.description
+    task.deadline = task_inf.deadline
+    task.priority = task_inf.priority
+    task.repeatable = task_inf.repeatable or task_inf.repeatabletype in {1, 2, 3}
+    task.repeatabletype = task_inf.repeatabletype
+    task.participating = id_tuple(task_inf.participating)
+    return tasks.update(task)
+
+def finish_task(task: Task) -> bool:
+    #True when the task counts as done now, False when it was reopened
+    rule = task_rule(task)
+    if rule and not task.done:
+        #A repeating task stays open and moves on to its next occurrence, skipping missed ones
+        task.deadline = rule.next_after(max(as_utc(task.deadline), datetime.now(timezone.utc)))
+        completed = True
+    else:
+        task.done = not task.done
+        completed = task.done
+    tasks.update(task)
+    return completed
 
 @app.post("/tasks/{userId}/add")
 async def add_task(task_inf: TaskRequest, userId: int):
@@ -155,33 +370,19 @@ async def add_task(task_inf: TaskRequest, userId: int):
             status_code=400,
             detail={"error": "DescTooLong", "message": "Failed: only 450 symbols for description"}
         )
-    global tasks_id
-    repeatable = task_inf.repeatable or task_inf.repeatabletype in {1, 2, 3}
-    task = Task(
-        id=tasks_id,
-        name=task_inf.name,
-        description=task_inf.description,
-        datecreation=date.today(),
-        deadline=task_inf.deadline,
-        priority=task_inf.priority,
-        repeatable=repeatable,
-        repeatabletype=task_inf.repeatabletype,
-        participating=task_inf.participating,
-        done=False,
-        created_by=userId)
-    tasks_id = tasks_id + 1
-    tasks.append(task)
-    user = next((u for u in users if u.id == userId), None)
+    task = tasks.add(new_task(task_inf, userId))
+    user = users.get(userId)
     if user:
-        user.created_tasks += 1
+        users.increment(user, "created_tasks", 1)
     else:
         raise HTTPException(status_code=404, detail="User not found")
     if user.created_tasks == 5:
-        user.has_achievement.append(4)
+        user.has_achievement += (4,)
     elif user.created_tasks == 10:
-        user.has_achievement.append(5)
+        user.has_achievement += (5,)
     elif user.created_tasks == 100:
-        user.has_achievement.append(6)
+        user.has_achievement += (6,)
+    users.update(user)
 
     return task
 
@@ -198,141 +399,142 @@ async def update_task(task_inf: TaskRequest, taskId: int):
             detail={"error": "DescTooLong", "message": "Failed: only 450 symbols for description"}
         )
 
-    task = next((t for t in tasks if t.id == taskId), None)
-    repeatable = task_inf.repeatable or task_inf.repeatabletype in {1, 2, 3}
+    task = tasks.get(taskId)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    # Update the task details with the new information
-    task.name = task_inf.name
-    task.description = task_inf.description
-    task.deadline = task_inf.deadline
-    task.priority = task_inf.priority
-    task.repeatable = repeatable
-    task.repeatabletype = task_inf.repeatabletype
-    task.participating = task_inf.participating
-
-    return task
+    return edit_task(task, task_inf)
 
 
 @app.put("/tasks/{userId}/doneupdate/{taskId}")
 async def complete_task(taskId: int, userId: int):
-    task = next((t for t in tasks if t.id == taskId), None)
+    task = tasks.get(taskId)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    task.done = not task.done
-    user = next((u for u in users if u.id == userId), None)
+    completed = finish_task(task)
+    user = users.get(userId)
 
     if user:
-        if task.done == True:
-            user.done_tasks += 1
+        if completed:
+            users.increment(user, "done_tasks", 1)
         else:
-            user.done_tasks -= 1
+            users.increment(user, "done_tasks", -1)
     else:
         raise HTTPException(status_code=404, detail="User not found")
 
     if user.done_tasks == 5:
-        user.has_achievement.append(1)
+        user.has_achievement += (1,)
     elif user.done_tasks == 10:
-        user.has_achievement.append(2)
+        user.has_achievement += (2,)
     elif user.done_tasks == 100:
-        user.has_achievement.append(3)
+        user.has_achievement += (3,)
+    users.update(user)
 
     return {"message": "Task completed"}
 
 
 @app.delete("/deltask/{taskId}")
 async def delete_task(taskId: int):
-    task_to_delete = next((task for task in tasks if task.id == taskId), None)
+    task_to_delete = tasks.remove(taskId)
     if task_to_delete is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    tasks.remove(task_to_delete)
     return {"message": "Task deleted successfully"}
 
 
 #*------------*EVENT ENDPOINTS*------------*
 @app.get("/events/{userId}")
-async def get_events_user(userId: int):
-    userId_events = [event for event in events if event.created_by == userId or userId in event.participating]
-    
-    for event in userId_events:
-        if event.starttime.tzinfo is None:
-            event.starttime = event.starttime.replace(tzinfo=timezone.utc)
+@versioned(events, users)
+async def get_events_user(userId: int, embed_users: bool = False):
+    userId_events = events.lookup("day", userId)
 
     events_by_date = defaultdict(list)
     for event in userId_events:
-        event_date = event.starttime.date()
-        creator = next((u.name for u in users if u.id == event.created_by), "Unknown")
-        formatted_event = {
-            "id": event.id,
-            "name": event.name,
-            "starttime": event.starttime.strftime("%d.%m.%Y %H:%M"),
-            "endtime": event.endtime.strftime("%d.%m.%Y %H:%M"),
-            "description": event.description,
-            "participating": event.participating,
-            "created_by": event.created_by,
-            "from": creator
-        }
-        events_by_date[event_date].append(formatted_event)
+        event_date = as_utc(event.starttime).date()
+        events_by_date[event_date].append(encode_event(event))
 
     returnevent = [
         {
             "date": date.strftime("%d.%m.%Y"),
             "events": event_list
         }
-        for date, event_list in sorted(events_by_date.items())
+        for date, event_list in events_by_date.items()
     ]
 
-    return returnevent
+    if embed_users:
+        return json_response({"events": returnevent, "users": embedded_users(userId_events)})
+    return json_response(returnevent)
 
 
 @app.get("/events_last/{userId}")
+@versioned(events, users)
 async def get_last_event_user(userId: int):
-    user_events = [event for event in events if event.created_by == userId or userId in event.participating]
+    user_events = events.lookup("starttime", userId, 1)
     if not user_events:
         return None
 
-    for event in user_events:
-        if event.starttime.tzinfo is None:
-            event.starttime = event.starttime.replace(tzinfo=timezone.utc)
-
-    last_event =  min(user_events, key=lambda e: e.starttime)
-    creator_name = next((u.name for u in users if u.id == last_event.created_by), "Unknown")
-    formatted_last_event = {
-        "id": last_event.id,
-        "name": last_event.name,
-        "starttime": last_event.starttime.strftime("%d.%m.%Y %H:%M"),
-        "endtime": last_event.endtime.strftime("%d.%m.%Y %H:%M") if last_event.endtime else None,
-        "description": last_event.description,
-        "participating": last_event.participating,
-        "created_by": last_event.created_by,
-        "from": creator_name
-    }
+    return json_response(encode_event(user_events[0]))
+
+
+@app.get("/events/{userId}/calendar")
+@versioned(events, users, default_window)
+async def get_events_calendar(userId: int, start: datetime | None = None, end: datetime | None = None):
+    #The user's events overlapping [start, end) by start time, this week from now by default
+    start = as_utc(start) if start else datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    end = as_utc(end) if end else start + timedelta(days=7)
+    if end <= start:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "InvalidRange", "message": "Failed: end must be after start"}
+        )
+    return json_response([encode_event(events.get(id)) for id in events.indexes["calendar"].between(userId, start, end)])
 
-    return formatted_last_event
+
+def check_event_conflicts(event_inf: EventRequest, userId: int, eventId: int | None = None):
+    #Opt-in for add/update: refuse an event that overlaps another one of its creator or participants
+    clashing = events.indexes["calendar"].conflicts([userId, *event_inf.participating], as_utc(event_inf.starttime),
+                                                    as_utc(event_inf.endtime) if event_inf.endtime else None, eventId)
+    if clashing:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "error": "EventConflict",
+                "message": f"Failed: overlaps {len(clashing)} event(s) of its participants",
+                "conflicts": [format_event(events.get(id)) for id in clashing],
+            }
+        )
 
 
 @app.get("/event/{eventId}")
+@versioned(events, users)
 async def get_event(eventId: int):
-    event = next((e for e in events if e.id == eventId), None)
+    event = events.get(eventId)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
-    creator_name = next((u.name for u in users if u.id == event.created_by), "Unknown")
-    formatted_event = {
-        "id": event.id,
-        "name": event.name,
-        "starttime": event.starttime.strftime("%d.%m.%Y %H:%M"),
-        "endtime": event.endtime.strftime("%d.%m.%Y %H:%M") if event.endtime else None,
-        "description": event.description,
-        "participating": event.participating,
-        "created_by": event.created_by,
-        "from": creator_name
-    }
-    return formatted_event
+    return json_response(encode_event(event))
+
+
+def new_event(event_inf: EventRequest, userId: int) -> Event:
+    return Event(
+        id=ids.next("events_id"),
+        name=event_inf.name,
+        starttime=event_inf.starttime,
+        endtime=event_inf.endtime,
+        description=event_inf.description,
+        participating=event_inf.participating,
+        created_by=userId
+    )
 
+def edit_event(event: Event, event_inf: EventRequest) -> Event:
+    # Update the event details with the new information
+    event.name = event_inf.name
+    event.starttime = event_inf.starttime
+    event.endtime = event_inf.endtime
+    event.description = event_inf.description
+    event.participating = id_tuple(event_inf.participating)
+    return events.update(event)
 
 @app.post("/events/{userId}/add")
-async def add_event(event_inf: EventRequest, userId: int):
+async def add_event(event_inf: EventRequest, userId: int, check_conflicts: bool = False):
     if len(event_inf.name) > 50:
         raise HTTPException(
             status_code=400,
@@ -344,36 +546,28 @@ async def add_event(event_inf: EventRequest, userId: int):
             detail={"error": "DescTooLong", "message": "Failed: only 450 symbols for description"}
         )
 
-    global events_id
-    event = Event(
-        id=events_id,
-        name=event_inf.name,
-        starttime=event_inf.starttime,
-        endtime=event_inf.endtime,
-        description=event_inf.description,
-        participating=event_inf.participating,
-        created_by=userId
-    )
-    events_id = events_id + 1
-    events.append(event)
+    if check_conflicts:
+        check_event_conflicts(event_inf, userId)
+    event = events.add(new_event(event_inf, userId))
 
-    user = next((u for u in users if u.id == userId), None)
+    user = users.get(userId)
     if user:
-        user.created_events += 1
+        users.increment(user, "created_events", 1)
     else:
         raise HTTPException(status_code=404, detail="User not found")
 
     if user.created_events == 5:
-        user.has_achievement.append(7)
+        user.has_achievement += (7,)
     elif user.created_events == 10:
-        user.has_achievement.append(8)
+        user.has_achievement += (8,)
     elif user.created_events == 100:
-        user.has_achievement.append(9)
+        user.has_achievement += (9,)
+    users.update(user)
 
     return event
 
 @app.put("/events/update/{eventId}")
-async def update_event(event_inf: EventRequest, eventId: int):
+async def update_event(event_inf: EventRequest, eventId: int, check_conflicts: bool = False):
     if len(event_inf.name) > 50:
         raise HTTPException(
             status_code=400,
@@ -385,115 +579,72 @@ async def update_event(event_inf: EventRequest, eventId: int):
             detail={"error": "DescTooLong", "message": "Failed: only 450 symbols for description"}
         )
     
-    event = next((e for e in events if e.id == eventId), None)
+    event = events.get(eventId)
 
     # If event not found, raise an exception
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
+    if check_conflicts:
+        check_event_conflicts(event_inf, event.created_by, eventId)
 
-    # Update the event details with the new information
-    event.name = event_inf.name
-    event.starttime = event_inf.starttime
-    event.endtime = event_inf.endtime
-    event.description = event_inf.description
-    event.participating = event_inf.participating
-
-    return event
+    return edit_event(event, event_inf)
 
 
 @app.delete("/delevent/{eventId}")
 async def delete_task(eventId: int):
-    event_to_delete = next((event for event in events if event.id == eventId), None)
+    event_to_delete = events.remove(eventId)
     if event_to_delete is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    events.remove(event_to_delete)
     return {"message": "Event deleted successfully"}
 
 
 #*------------*TRANSACTION ENDPOINTS*------------*
 @app.get("/transactions")
-async def get_transactions(filter: str | None = None,  trantype: str = "all"):
-    filtered_transactions = []
-    if trantype == "income":
-        filtered_transactions = [transaction for transaction in transactions if transaction.isIncome]
-    elif trantype == "outcome":
-        filtered_transactions = [transaction for transaction in transactions if not transaction.isIncome]
-    else:
-        filtered_transactions = transactions
-
-    filtered_transactions = list(reversed(filtered_transactions))
-
-    returntransactions = []
+@versioned(transactions)
+async def get_transactions(filter: str | None = None,  trantype: str = "all", limit: int | None = None, cursor: str | None = None):
+    kind = trantype if trantype in ("income", "outcome") else "all"
+    #Newest first, or biggest first when sorted by amount (by absolute value for outcome)
     if filter == "amount":
-        returntransactions = sorted(filtered_transactions, key=lambda t: abs(t.amount), reverse=True) if trantype == "outcome" else sorted(filtered_transactions, key=lambda t: t.amount, reverse=True)
-    elif filter:
-        returntransactions = [transaction for transaction in filtered_transactions if transaction.dtype == filter]
+        index, key = ("outcome_amount", kind) if trantype == "outcome" else ("amount", kind)
     else:
-        returntransactions = filtered_transactions
+        index, key = "datecreation", (kind, filter or None)
 
-    formatted_transactions = [
-        {
-            "id": transaction.id,
-            "amount": transaction.amount,
-            "datecreation": transaction.datecreation.strftime("%d.%m.%Y %H:%M"),
-            "isIncome": transaction.isIncome,
-            "jarId": transaction.jarId,
-            "dtype": transaction.dtype,
-        }
-        for transaction in returntransactions
-    ]
+    if limit is None and cursor is None:
+        return json_response([encode_transaction(transaction) for transaction in transactions.lookup(index, key, reverse=True)])
 
-    return formatted_transactions
+    page, next_cursor = read_page(transactions, index, key, limit, cursor, reverse=True)
+    return json_response({
+        "transactions": [encode_transaction(transaction) for transaction in page],
+        "next_cursor": next_cursor
+    })
 
 @app.get("/transaction/{transactionId}")
+@versioned(transactions)
 async def get_transaction(transactionId: int):
-    transaction = next((t for t in transactions if t.id == transactionId), None)
+    transaction = transactions.get(transactionId)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    formatted_transaction = {
-        "id": transaction.id,
-        "amount": transaction.amount,
-        "datecreation": transaction.datecreation.strftime("%d.%m.%Y %H:%M"),
-        "isIncome": transaction.isIncome,
-        "jarId": transaction.jarId,
-        "dtype": transaction.dtype,
-    }
-
-    return formatted_transaction
+    return json_response(encode_transaction(transaction))
 
 @app.get("/transaction_last")
+@versioned(transactions)
 async def get_last_transaction():
     if len(transactions) == 0 :
         return None
-    last_transaction = sorted(transactions, key=lambda t: t.datecreation, reverse=True)[0]
-
-    formatted_transaction = {
-        "id": last_transaction.id,
-        "amount": last_transaction.amount,
-        "datecreation": last_transaction.datecreation.strftime("%d.%m.%Y %H:%M"),
-        "isIncome": last_transaction.isIncome,
-        "jarId": last_transaction.jarId,
-        "dtype": last_transaction.dtype,
-    }
+    last_transaction = transactions.lookup("datecreation", ("all", None), 1, reverse=True)[0]
 
-    return formatted_transaction
-
-@app.post("/transactions/add")
-async def add_transaction(transaction_inf: TransactionRequest):
-    if transaction_inf.amount == 0 :
-        return {"message": "Amount cannot be zero"}
+    return json_response(encode_transaction(last_transaction))
 
-    global transactions_id
+def new_transaction(transaction_inf: TransactionRequest, datecreation: datetime) -> Transaction:
     transaction = Transaction(
-        id=transactions_id,
+        id=ids.next("transactions_id"),
         amount=0,
-        datecreation=datetime.now(),
+        datecreation=datecreation,
         isIncome=transaction_inf.isIncome,
         jarId=transaction_inf.jarId,
         dtype=transaction_inf.dtype,
     )
-    transactions_id = transactions_id + 1
 
     if not transaction_inf.isIncome and transaction_inf.amount > 0:
         transaction.amount = transaction_inf.amount * (-1)
@@ -504,37 +655,166 @@ async def add_transaction(transaction_inf: TransactionRequest):
         transaction.amount = transaction_inf.amount
 
     if transaction.jarId is not None:
-        jar = next((jar for jar in jars if jar.id == transaction.jarId), None)
-        jar.currentamount += abs(transaction.amount)
-        jar.has_transactions.append(transaction.id)
-
         transaction.isIncome = False
         transaction.amount = (-1) * abs(transaction.amount)
+    return transaction
+
+@app.post("/transactions/add")
+async def add_transaction(transaction_inf: TransactionRequest):
+    if transaction_inf.amount == 0 :
+        return {"message": "Amount cannot be zero"}
+
+    transaction = new_transaction(transaction_inf, datetime.now())
+    if transaction.jarId is not None:
+        jar = jars.get(transaction.jarId)
+        jar.currentamount += abs(transaction.amount)
+        jars.update(jar)
 
-    global budget
-    budget = budget + transaction.amount
-    transactions.append(transaction)
+    state.increment("budget", transaction.amount)
+    transactions.add(transaction)
     return transaction
 
+#Rows are parsed and checked outside the write lock and applied in batches, each under
+#the lock in its own storage transaction: one budget update and one update per touched jar
+import_batch = 1_000
+import_error_limit = 100
+#Running imports keep their family loaded between batches
+importing = family_local(lambda family: set())
+
+def add_transactions(batch: list[tuple[int, TransactionImportRequest]]) -> list[tuple[int, str]]:
+    #(line, message) of the rows whose jar was deleted since they were checked
+    failed = [(line, "Jar not found") for line, transaction_inf in batch
+              if transaction_inf.jarId is not None and transaction_inf.jarId not in jars]
+    if failed:
+        rejected = {line for line, _ in failed}
+        batch = [(line, transaction_inf) for line, transaction_inf in batch if line not in rejected]
+    known_types = {t.name for t in dtypes if t.relate == "transaction"}
+    for name in sorted({transaction_inf.dtype for _, transaction_inf in batch} - known_types):
+        dtypes.add(Type(id=ids.next("dtypes_id"), name=name, relate="transaction"))
+    budget = 0.0
+    touched = {}
+    for _, transaction_inf in batch:
+        transaction = new_transaction(transaction_inf, transaction_inf.datecreation or datetime.now())
+        if transaction.jarId is not None:
+            jar = touched.setdefault(transaction.jarId, jars.get(transaction.jarId))
+            jar.currentamount += abs(transaction.amount)
+        budget += transaction.amount
+        transactions.add(transaction)
+    for jar in touched.values():
+        jars.update(jar)
+    if budget:
+        state.increment("budget", budget)
+    return failed
+
+def import_error(e: ValueError) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+    return str(e)
+
+@app.post("/transactions/import")
+async def import_transactions(request: Request, format: str | None = None):
+    #Streams the upload, unknown transaction types are created, unknown jars are errors
+    format = pick_format(format, request.headers.get("content-type"))
+    if format is None:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "InvalidFormat", "message": f"Failed: format must be one of {', '.join(FORMATS)}"}
+        )
+    batch = []
+    imported, failed, errors = 0, 0, []
+
+    def fail(line: int, message: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < import_error_limit:
+            errors.append({"line": line, "message": message})
+
+    async def apply():
+        nonlocal imported
+        async with writing():
+            rejected = add_transactions(batch)
+        imported += len(batch) - len(rejected)
+        for line, message in rejected:
+            fail(line, message)
+        batch.clear()
+
+    token = object()
+    importing.add(token)
+    try:
+        async for line, record in read_records(request.stream(), format):
+            try:
+                if isinstance(record, ValueError):
+                    raise record
+                transaction_inf = TransactionImportRequest.model_validate(record)
+                if transaction_inf.amount == 0:
+                    raise ValueError("Amount cannot be zero")
+                if transaction_inf.jarId is not None and transaction_inf.jarId not in jars:
+                    raise ValueError("Jar not found")
+            except (ValueError, ValidationError) as e:
+                fail(line, import_error(e))
+                continue
+            batch.append((line, transaction_inf))
+            if len(batch) >= import_batch:
+                await apply()
+        if batch:
+            await apply()
+    finally:
+        importing.discard(token)
+    return {"imported": imported, "failed": failed, "errors": errors}
+
+def export_format(format: str) -> str:
+    if format not in FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "InvalidFormat", "message": f"Failed: format must be one of {', '.join(FORMATS)}"}
+        )
+    return format
+
+def walk(table: Table, index: str, key, size: int = 500):
+    #Rows in index order a page at a time, writes between pages don't break the walk
+    after = None
+    while True:
+        page = table.lookup(index, key, size, after)
+        yield from page
+        if len(page) < size:
+            return
+        after = table.indexes[index].order(page[-1])
+
+def export_response(rows, fields: tuple[str, ...], format: str, name: str) -> StreamingResponse:
+    async def stream():
+        #Each chunk is encoded on the event loop between sends, other requests run in between
+        for chunk in write_records(rows, fields, format):
+            yield chunk
+    return StreamingResponse(stream(), media_type=FORMATS[format],
+                             headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'})
+
+@app.get("/transactions/export")
+async def export_transactions(format: str = "csv"):
+    format = export_format(format)
+    #Oldest first
+    rows = (format_transaction(transaction) for transaction in walk(transactions, "datecreation", ("all", None)))
+    return export_response(rows, ("id", "amount", "datecreation", "isIncome", "jarId", "dtype"), format, "transactions")
+
 
 @app.delete("/deltransaction/{transactionId}")
 async def delete_transaction(transactionId: int):
-    transaction = next((transaction for transaction in transactions if transaction.id == transactionId), None)
+    transaction = transactions.get(transactionId)
     if transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
     if transaction.jarId is not None:
-        jar = next((jar for jar in jars if jar.id == transaction.jarId), None)
+        jar = jars.get(transaction.jarId)
         jar.currentamount += transaction.amount
-        jar.has_transactions.remove(transaction.id)
-    global budget
-    budget = budget - transaction.amount
-    transactions.remove(transaction)
-    return transactions
+        jars.update(jar)
+    state.increment("budget", -transaction.amount)
+    transactions.remove(transactionId)
+    return {"message": "Transaction deleted successfully"}
 
 
 #*------------*JAR ENDPOINTS*------------*
 @app.get("/jars")
-async def get_jars():
+@versioned(jars, transactions)
+async def get_jars(transactions_limit: int | None = None):
+    check_limit(transactions_limit, "transactions_limit")
     if len(jars) == 0:
         return None
 
@@ -542,55 +822,30 @@ async def get_jars():
     for jar in jars:
         percent = int((jar.currentamount / jar.totalamount) * 100) if jar.totalamount > 0 else 0
 
-        jar_transactions = [
-            {
-                "id": transaction.id,
-                "amount": transaction.amount,
-                "datecreation": transaction.datecreation.strftime("%d.%m.%Y %H:%M"),
-                "isIncome": transaction.isIncome,
-                "jarId": transaction.jarId,
-                "dtype": transaction.dtype,
-            }
-            for transaction in transactions if transaction.id in jar.has_transactions
-        ]
-
-        formatted_data = {
-            "id": jar.id,
-            "target": jar.target,
-            "totalamount": jar.totalamount,
-            "currentamount": jar.currentamount,
-            "deadline": jar.deadline.strftime("%d.%m.%Y") if jar.deadline else None,
-            "has_transactions": jar.has_transactions,
-        }
+        jar_transactions = [encode_transaction(transaction) for transaction in jar_history(jar.id, transactions_limit)]
 
         returnjars.append({
             "percent": percent,
-            "data": formatted_data,
+            "data": encode_jar(jar),
             "transactions": jar_transactions
         })
 
-    return returnjars
+    return json_response(returnjars)
 
 
 @app.get("/jars/highest")
+@versioned(jars, transactions)
 async def get_highest_jar():
     if len(jars) == 0:
         return None
-    jar_with_highest_percent = max(jars, key=lambda jar: (jar.currentamount / jar.totalamount * 100) if jar.totalamount > 0 else 0)
+    jar_with_highest_percent = jars.lookup("progress", "all", 1, reverse=True)[0]
 
     percent = int((jar_with_highest_percent.currentamount / jar_with_highest_percent.totalamount) * 100) \
         if jar_with_highest_percent.totalamount > 0 else 0
 
-    jar_transactions = [transaction for transaction in transactions if transaction.id in jar_with_highest_percent.has_transactions]
+    jar_transactions = jar_history(jar_with_highest_percent.id)
 
-    formatted_jar = {
-        "id": jar_with_highest_percent.id,
-        "target": jar_with_highest_percent.target,
-        "totalamount": jar_with_highest_percent.totalamount,
-        "currentamount": jar_with_highest_percent.currentamount,
-        "deadline": jar_with_highest_percent.deadline.strftime("%d.%m.%Y") if jar_with_highest_percent.deadline else None,
-        "has_transactions": jar_with_highest_percent.has_transactions,
-    }
+    formatted_jar = format_jar(jar_with_highest_percent)
 
     return {
         "percent": percent,
@@ -599,41 +854,27 @@ async def get_highest_jar():
     }
 
 @app.get("/jar/{jarId}")
-async def get_jar(jarId: int):
+@versioned(jars, transactions)
+async def get_jar(jarId: int, limit: int | None = None, cursor: str | None = None):
     if len(jars) == 0:
         return None
-    jar = next((jar for jar in jars if jar.id == jarId), None)
+    jar = jars.get(jarId)
+    if jar is None:
+        raise HTTPException(status_code=404, detail="Jar not found")
     percent = int((jar.currentamount / jar.totalamount) * 100) if jar.totalamount > 0 else 0
-    jar_transactions = [
-        {
-            "id": transaction.id,
-            "amount": transaction.amount,
-            "datecreation": transaction.datecreation.strftime("%d.%m.%Y %H:%M"),
-            "isIncome": transaction.isIncome,
-            "jarId": transaction.jarId,
-            "dtype": transaction.dtype,
-        }
-        for transaction in transactions if transaction.id in jar.has_transactions
-    ]
-
-    formatted_jar = {
-        "id": jar.id,
-        "target": jar.target,
-        "totalamount": jar.totalamount,
-        "currentamount": jar.currentamount,
-        "deadline": jar.deadline.strftime("%d.%m.%Y") if jar.deadline else None,
-        "has_transactions": jar.has_transactions,
-    }
-
-    return ({
+    paginated = limit is not None or cursor is not None
+    page, next_cursor = read_page(transactions, "jar", jarId, limit, cursor) if paginated else (jar_history(jarId), None)
+    returnjar = {
         "percent": percent,
-        "data": formatted_jar,
-        "transactions": jar_transactions
-    })
+        "data": encode_jar(jar),
+        "transactions": [encode_transaction(transaction) for transaction in page]
+    }
+    if paginated:
+        returnjar["next_cursor"] = next_cursor
+    return json_response(returnjar)
 
 @app.post("/jars/add")
 async def add_jar(jar_inf: JarRequest):
-    global jars_id
     if jar_inf.totalamount < 0.0:
         raise HTTPException(
             status_code=400,
@@ -641,100 +882,123 @@ async def add_jar(jar_inf: JarRequest):
         )
 
     jar = Jar(
-        id=jars_id,
+        id=ids.next("jars_id"),
         target=jar_inf.target,
         totalamount=jar_inf.totalamount,
         currentamount=0,
         deadline=jar_inf.deadline,
-        has_transactions=[]
     )
-    jars_id = jars_id + 1
-    jars.append(jar)
-    return jar
+    jars.add(jar)
+    return jar_row(jar)
 
 @app.put("/jars/{jarId}/deadline")
 async def update_jar_deadline(jarId: int, deadline: JarUpdateDeadlineRequest):
-    jar = next((jar for jar in jars if jar.id == jarId), None)
+    jar = jars.get(jarId)
     if jar is None:
         raise HTTPException(status_code=404, detail="Jar not found")
     jar.deadline = deadline.deadline
-    return jar
+    jars.update(jar)
+    return jar_row(jar)
 
 @app.put("/jars/{jarId}/amount")
 async def update_jar_deadline(jarId: int, amounts: JarUpdateAmountRequest):
-    jar = next((jar for jar in jars if jar.id == jarId), None)
+    jar = jars.get(jarId)
     if jar is None:
         raise HTTPException(status_code=404, detail="Jar not found")
     if jar.totalamount != amounts.totalamount:
         jar.totalamount = amounts.totalamount
-        return jar
+        jars.update(jar)
+        return jar_row(jar)
     elif jar.currentamount != amounts.currentamount:
         isBigger = jar.currentamount > amounts.currentamount
-        global transactions_id
         transaction = Transaction(
-            id=transactions_id,
+            id=ids.next("transactions_id"),
             amount=jar.currentamount - amounts.currentamount,
             datecreation=datetime.now(),
             isIncome= isBigger,
             jarId=jarId,
             dtype="Jar",
         )
-        transactions_id = transactions_id + 1
         jar.currentamount = amounts.currentamount
-        global transactions
-        transactions.append(transaction)
-        global budget
-        budget = budget + transaction.amount
-        jar.has_transactions.append(transaction.id)
-    return jar
+        transactions.add(transaction)
+        state.increment("budget", transaction.amount)
+        jars.update(jar)
+    return jar_row(jar)
 
 @app.delete("/deljar/{jarId}")
 async def del_jar(jarId: int):
-    jar = next((jar for jar in jars if jar.id == jarId), None)
+    jar = jars.get(jarId)
     if jar is None:
         raise HTTPException(status_code=404, detail="Jar not found")
-    for transaction in transactions:
-        if transaction.jarId == jarId:
-            transaction.jarId = None
-    jars.remove(jar)
+    for transaction in transactions.lookup("jar", jarId):
+        transaction.jarId = None
+        transactions.update(transaction)
+    jars.remove(jarId)
     return {"message": "Jar deleted successfully"}
 
 
+@app.get("/jars/export")
+async def export_jars(format: str = "csv"):
+    format = export_format(format)
+    rows = (format_jar(jar) for jar in jars.all())
+    return export_response(rows, ("id", "target", "totalamount", "currentamount", "deadline"), format, "jars")
+
+
 #*------------*TYPE ENDPOINTS*------------*
 @app.get("/type/{relate}")
+@versioned(dtypes)
 async def get_related_type(relate: str):
     returntypes = [t for t in dtypes if t.relate == relate]
     return returntypes
 
+@app.get("/types/export")
+async def export_types(format: str = "csv"):
+    format = export_format(format)
+    rows = ({"id": t.id, "name": t.name, "relate": t.relate} for t in dtypes.all())
+    return export_response(rows, ("id", "name", "relate"), format, "types")
+
 @app.post("/type/{relate}/add")
 async def add_type(type_inf: TypeRequest):
-    global dtypes_id
     newtype = Type(
-        id= dtypes_id,
+        id=ids.next("dtypes_id"),
         name=type_inf.name,
         relate=type_inf.relate
     )
-    dtypes_id = dtypes_id + 1
-    dtypes.append(newtype)
+    dtypes.add(newtype)
     return newtype
 
 
 #*------------*BUDGET ENDPOINTS*------------*
 @app.get("/budget")
+@versioned(state)
 async def get_budget():
-    if budget == 0:
+    if state["budget"] == 0:
         return {"amount" : 0}
-    roundedbudget = round(budget, 2)
+    roundedbudget = round(state["budget"], 2)
     return {"amount" : roundedbudget}
 
-@app.get("/budget/statistics")
-async def get_budget_statistics():
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-
-    monthly_transactions = [ tx for tx in transactions if tx.datecreation.month == current_month and tx.datecreation.year == current_year]
-    total_income = sum(tx.amount for tx in monthly_transactions if tx.isIncome)
-    total_outcome = sum(tx.amount for tx in monthly_transactions if not tx.isIncome)
+def parse_month(value: str | None) -> tuple[int, int]:
+    if value is None:
+        return datetime.now().year, datetime.now().month
+    try:
+        month = datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "InvalidMonth", "message": "Failed: month must look like 2024-11"}
+        )
+    return month.year, month.month
+
+def month_buckets(start: str | None, end: str | None) -> list:
+    #Rollup buckets (year, month, dtype, isIncome) -> [sum, count] of the months start..end, both included
+    start_year, start_month = parse_month(start)
+    end_year, end_month = parse_month(end)
+    following = (end_year + 1, 1) if end_month == 12 else (end_year, end_month + 1)
+    return list(transactions.indexes["month"].range((start_year, start_month), following))
+
+def budget_summary(buckets: list) -> dict:
+    total_income = sum(total[0] for key, total in buckets if key[3])
+    total_outcome = sum(total[0] for key, total in buckets if not key[3])
     total = total_income + total_outcome
     return {
         "total_income" : round(total_income, 2),
@@ -742,6 +1006,27 @@ async def get_budget_statistics():
         "total" : round(total, 2)
     }
 
+@app.get("/budget/statistics")
+@versioned(transactions, current_month)
+async def get_budget_statistics():
+    return budget_summary(month_buckets(None, None))
+
+@app.get("/budget/statistics/months")
+@versioned(transactions, current_month)
+async def get_budget_statistics_months(start: str | None = None, end: str | None = None):
+    by_month = defaultdict(list)
+    for key, total in month_buckets(start, end):
+        by_month[key[:2]].append((key, total))
+    return [{"year": year, "month": month, **budget_summary(buckets)} for (year, month), buckets in by_month.items()]
+
+@app.get("/budget/statistics/categories")
+@versioned(transactions, current_month)
+async def get_budget_statistics_categories(start: str | None = None, end: str | None = None):
+    by_dtype = defaultdict(list)
+    for key, total in month_buckets(start, end):
+        by_dtype[key[2]].append((key, total))
+    return [{"dtype": dtype, **budget_summary(buckets)} for dtype, buckets in sorted(by_dtype.items())]
+
 @app.put("/budget/update")
 async def update_budget(req: BudgetRequest):
     if req.amount < 0:
@@ -749,6 +1034,367 @@ async def update_budget(req: BudgetRequest):
             status_code=400,
             detail="Number must be between 0 and 100"
         )
-    global budget
-    budget = req.amount
-    return budget
+    state["budget"] = req.amount
+    return state["budget"]
+
+
+#*------------*BATCH ENDPOINTS*------------*
+#Several task/event/transaction changes in one request and one storage transaction. Every
+#operation is checked first, against the rows as the earlier operations leave them, and
+#nothing is applied unless all of them pass. User counters, achievements, the budget and
+#jars are written once per batch.
+batch_limit = 1_000
+batch_models = {"task.add": TaskRequest, "task.update": TaskRequest, "event.add": EventRequest, "event.update": EventRequest,
+                "transaction.add": TransactionRequest}
+batch_tables = {"task": tasks, "event": events, "transaction": transactions}
+#Counter -> (count reached, achievement id), same as the single endpoints hand out
+achievement_levels = {
+    "created_tasks": ((5, 4), (10, 5), (100, 6)),
+    "done_tasks": ((5, 1), (10, 2), (100, 3)),
+    "created_events": ((5, 7), (10, 8), (100, 9)),
+}
+
+def batch_error(error: str, message: str) -> dict:
+    return {"error": error, "message": f"Failed: {message}"}
+
+def check_operation(operation: BatchOperation, deleted: set) -> tuple[object, dict | None]:
+    #(validated data, error)
+    kind, action = operation.op.split(".")
+    data = None
+    if operation.op in batch_models:
+        if operation.data is None:
+            return None, batch_error("MissingData", "data is required")
+        try:
+            data = batch_models[operation.op].model_validate(operation.data)
+        except ValidationError as e:
+            return None, batch_error("InvalidData", import_error(e))
+        if kind != "transaction":
+            if len(data.name) > 50:
+                return None, batch_error("NameTooLong", "only 50 symbols for name")
+            if len(data.description) > 450:
+                return None, batch_error("DescTooLong", "only 450 symbols for description")
+        elif data.amount == 0:
+            return None, batch_error("ZeroAmount", "amount cannot be zero")
+        elif data.jarId is not None and data.jarId not in jars:
+            return None, batch_error("NotFound", "jar not found")
+    if kind != "transaction" and action in ("add", "done") and (operation.userId is None or operation.userId not in users):
+        return None, batch_error("NotFound", "user not found")
+    if action != "add":
+        if operation.id is None or operation.id not in batch_tables[kind] or (kind, operation.id) in deleted:
+            return None, batch_error("NotFound", f"{kind} not found")
+        if action == "delete":
+            deleted.add((kind, operation.id))
+    return data, None
+
+class BatchTotals:
+    #What a batch changes besides its own rows, written out once at the end
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.jars = {}
+        self.budget = 0.0
+
+    def jar(self, jarId: int) -> Jar:
+        return self.jars.setdefault(jarId, jars.get(jarId))
+
+    def write(self):
+        for (userId, field), delta in self.counts.items():
+            user = users.get(userId)
+            if user is None or delta == 0:
+                continue
+            before = getattr(user, field)
+            after = users.increment(user, field, delta)
+            for level, achievement in achievement_levels[field]:
+                if before < level <= after and achievement not in user.has_achievement:
+                    user.has_achievement += (achievement,)
+            users.update(user)
+        for jar in self.jars.values():
+            jars.update(jar)
+        if self.budget:
+            state.increment("budget", self.budget)
+
+def apply_operation(operation: BatchOperation, data, totals: BatchTotals):
+    match operation.op:
+        case "task.add":
+            totals.counts[(operation.userId, "created_tasks")] += 1
+            return tasks.add(new_task(data, operation.userId))
+        case "task.update":
+            return edit_task(tasks.get(operation.id), data)
+        case "task.done":
+            totals.counts[(operation.userId, "done_tasks")] += 1 if finish_task(tasks.get(operation.id)) else -1
+            return {"message": "Task completed"}
+        case "task.delete":
+            tasks.remove(operation.id)
+            return {"message": "Task deleted successfully"}
+        case "event.add":
+            totals.counts[(operation.userId, "created_events")] += 1
+            return events.add(new_event(data, operation.userId))
+        case "event.update":
+            return edit_event(events.get(operation.id), data)
+        case "event.delete":
+            events.remove(operation.id)
+            return {"message": "Event deleted successfully"}
+        case "transaction.add":
+            transaction = new_transaction(data, datetime.now())
+            if transaction.jarId is not None:
+                jar = totals.jar(transaction.jarId)
+                jar.currentamount += abs(transaction.amount)
+            totals.budget += transaction.amount
+            return transactions.add(transaction)
+        case "transaction.delete":
+            transaction = transactions.remove(operation.id)
+            if transaction.jarId is not None:
+                jar = totals.jar(transaction.jarId)
+                jar.currentamount += transaction.amount
+            totals.budget -= transaction.amount
+            return {"message": "Transaction deleted successfully"}
+
+@app.post("/batch")
+async def apply_batch(batch: BatchRequest):
+    if len(batch.operations) > batch_limit:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "BatchTooLarge", "message": f"Failed: at most {batch_limit} operations per batch"}
+        )
+    deleted = set()
+    checked = [check_operation(operation, deleted) for operation in batch.operations]
+    failed = sum(error is not None for data, error in checked)
+    if failed:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": "BatchRejected",
+                "message": f"Failed: {failed} of {len(checked)} operations can't be applied, nothing was changed",
+                "results": [{"op": operation.op, **(error or {})} for operation, (data, error) in zip(batch.operations, checked)],
+            }
+        )
+    totals = BatchTotals()
+    results = [{"op": operation.op, "result": apply_operation(operation, data, totals)}
+               for operation, (data, error) in zip(batch.operations, checked)]
+    totals.write()
+    return {"results": results}
+
+
+#*------------*SYNC ENDPOINTS*------------*
+#Collections /sync sends, rows in the same shape as their single endpoints
+sync_tables = [
+    (users, format_user),
+    (tasks, encode_task),
+    (events, encode_event),
+    (transactions, encode_transaction),
+    (jars, encode_jar),
+    (dtypes, embed),
+]
+
+def parse_sync_token(since: str) -> int | None:
+    #"<instance>.<family>.<seq>", None when it comes from another family, worker or earlier run
+    token_instance, _, seq = since.rpartition(".")
+    try:
+        seq = int(seq)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "InvalidCursor", "message": "Failed: since is not valid"}
+        )
+    return seq if token_instance == family.instance else None
+
+def visible(row, userId: int | None) -> bool:
+    #Tasks and events belong to their creator and participants, the rest to the whole family
+    if userId is None or not isinstance(row, (Task, Event)):
+        return True
+    return userId == row.created_by or userId in row.participating
+
+async def sync_content(seq: int, changed: dict | None, userId: int | None = None) -> dict:
+    #Rows changed after seq plus ids deleted since, everything when changed is None
+    snapshot = changed is None
+    content = {"seq": f"{family.instance}.{seq}", "snapshot": snapshot}
+    for table, encode in sync_tables:
+        if snapshot:
+            content[table.name] = {"upserts": [encode(row) for row in table if visible(row, userId)], "deleted": []}
+        elif table.name in changed:
+            rows = [(id, table.get(id)) for id in sorted(changed[table.name])]
+            upserts = [encode(row) for id, row in rows if row is not None and visible(row, userId)]
+            deleted = [id for id, row in rows if row is None]
+            if upserts or deleted:
+                content[table.name] = {"upserts": upserts, "deleted": deleted}
+    if snapshot or "budget" in changed.get(state.name, ()):
+        content["budget"] = await get_budget()
+    return content
+
+@app.get("/sync")
+@versioned(users, tasks, events, transactions, jars, dtypes, state)
+async def sync(since: str | None = None):
+    #Falls back to everything when the log no longer reaches back to since
+    seq = parse_sync_token(since) if since else None
+    current, changed = changes.since(seq) if seq is not None else (changes.seq, None)
+    return json_response(await sync_content(current, changed))
+
+
+#*------------*LIVE ENDPOINTS*------------*
+#Pushes the /sync delta of every committed change to the connected family members.
+#A resync message means messages were lost, the client should call /sync again.
+hub = family_local(lambda family: Hub())
+keepalive = 15
+
+def resync_message() -> bytes:
+    return json_response({"seq": f"{family.instance}.{changes.seq}", "resync": True}).body
+
+async def publish(seq: int):
+    current, changed = changes.since(seq)
+    if changed is None:
+        hub.broadcast(resync_message())
+    elif changed:
+        async def message_for(userId: int) -> bytes | None:
+            content = await sync_content(current, changed, userId)
+            return json_response(content).body if len(content) > 2 else None
+        await hub.publish(message_for, resync_message())
+
+def refresh_live():
+    #Reloaded tables can't say what changed, so subscribers resync
+    if refresh() and hub:
+        hub.broadcast(resync_message())
+
+class LiveSink:
+    #Due reminders go to the connected members they concern, nothing is kept for offline ones
+    async def deliver(self, notification: dict):
+        use_family(notification["family"])
+        if not hub:
+            return
+        message = json_response({"notification": {key: notification[key] for key in ("collection", "id", "kind", "due")}}).body
+        users_for = set(notification["users"])
+        async def message_for(userId: int) -> bytes | None:
+            return message if userId in users_for else None
+        await hub.publish(message_for, resync_message())
+
+reminders.sink = LiveSink()
+
+async def watch_storage():
+    #Other workers' commits only show up on the next request, look for them while someone listens
+    while hub:
+        await asyncio.sleep(1)
+        if not family.write_lock.locked():
+            refresh_live()
+
+def subscribe(userId: int) -> Subscriber:
+    hub.watch(watch_storage)
+    return hub.subscribe(userId)
+
+@app.websocket("/live/{userId}")
+async def live_socket(websocket: WebSocket, userId: int):
+    try:
+        use_family(family_id(websocket))
+    except (ValueError, LookupError):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    refresh_live()
+    if userId not in users:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscriber = subscribe(userId)
+
+    async def send_messages():
+        while True:
+            message = await subscriber.get()
+            await websocket.send_text(message.decode())
+
+    sender = asyncio.create_task(send_messages())
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(subscriber)
+
+@app.get("/live/{userId}/stream")
+async def live_stream(userId: int):
+    if userId not in users:
+        raise HTTPException(status_code=404, detail="User not found")
+    subscriber = subscribe(userId)
+
+    async def stream():
+        try:
+            while True:
+                message = await subscriber.get(keepalive)
+                yield b": keepalive\n\n" if message is None else b"data: " + message + b"\n\n"
+        finally:
+            hub.unsubscribe(subscriber)
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+#*------------*DASHBOARD ENDPOINTS*------------*
+#Everything the Home and Finance screens load, in the same shape as the single endpoints
+dashboard_fields = {
+    "user": lambda userId: get_user(userId),
+    "budget": lambda userId: get_budget(),
+    "transaction_last": lambda userId: get_last_transaction(),
+    "jars": lambda userId: get_jars(),
+    "jars_highest": lambda userId: get_highest_jar(),
+    "events_last": lambda userId: get_last_event_user(userId),
+    "tasks": lambda userId: get_tasks_user(userId),
+    "users": lambda userId: get_users(),
+}
+
+@app.get("/dashboard/{userId}")
+@versioned(users, tasks, events, transactions, jars, state)
+async def get_dashboard(userId: int, fields: str | None = None):
+    requested = fields.split(",") if fields else list(dashboard_fields)
+    unknown = [field for field in requested if field not in dashboard_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail={"error": "UnknownField", "message": f"Failed: unknown fields {', '.join(unknown)}"}
+        )
+    return json_response({field: embed(await dashboard_fields[field](userId)) for field in requested})
+
+
+#*------------*METRICS ENDPOINTS*------------*
+#Store gauges are only computed when scraped, summed over the families of this worker
+def store_rows() -> dict:
+    rows = defaultdict(int)
+    for current in list(families.values()):
+        for table, model in current.tables:
+            rows[(table.name,)] += len(table)
+    return rows
+
+def store_index_entries() -> dict:
+    entries = defaultdict(int)
+    for current in list(families.values()):
+        for table, model in current.tables:
+            for name, index in table.indexes.items():
+                entries[(table.name, name)] += len(index)
+    return entries
+
+registry.add(Gauge("store_rows", "Rows per collection", ("collection",), store_rows))
+registry.add(Gauge("store_index_entries", "Keys per index, cached rows for the json index", ("collection", "index"), store_index_entries))
+registry.add(Gauge("store_families", "Families loaded by this worker", (), lambda: {(): len(families)}))
+registry.add(Gauge("reminders_pending", "Reminder timers waiting to fire in this worker", (), lambda: {(): len(reminders)}))
+registry.add(Gauge("event_loop_lag_seconds", "How late the event loop woke up, last check and worst so far", ("kind",),
+                   lambda: {("last",): loop_lag.last, ("worst",): loop_lag.worst}))
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+#*------------*DEBUG ENDPOINTS*------------*
+def check_profile_token(token: str | None):
+    if profiler is None or not profiler.allowed(token):
+        raise HTTPException(
+            status_code=403,
+            detail={"error": "Forbidden", "message": "Failed: profiling is off or the token is wrong"}
+        )
+
+@app.get("/debug/profiles")
+async def get_profiles(x_profile: str | None = Header(None)):
+    check_profile_token(x_profile)
+    return [{key: value for key, value in report.items() if key != "report"} for report in reversed(profiler.reports)]
+
+@app.get("/debug/profiles/{profileId}")
+async def get_profile(profileId: int, x_profile: str | None = Header(None)):
+    check_profile_token(x_profile)
+    report = profiler.get(profileId)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(report["report"])
@@ -0,0 +1,64 @@
+#Run from the api directory: python -m benchmarks.batch 200
+#The same changes as one request each and as one POST /batch, each in a fresh family:
+#add tasks, mark them done, add transactions, delete the tasks again.
+import asyncio
+import sys
+import time
+from datetime import date
+
+from app import app
+from benchmarks.asgi import request
+from database import create_family, get_family
+from models_database import User
+
+task_body = {"name": "Bench", "description": "", "deadline": "2030-01-01T10:00:00", "priority": 2,
+             "repeatable": False, "repeatabletype": 0, "participating": [1]}
+transaction_body = {"amount": 12.5, "isIncome": False, "dtype": "Groceries"}
+
+
+def prepare(familyId: int) -> dict:
+    family = create_family(familyId)
+    family.users.add(User(id=1, avatar_id="1.png", name="Bench", surname="", role="", dob=date(1990, 1, 1)))
+    return {"X-Family-Id": str(familyId)}
+
+
+async def one_by_one(count: int, headers: dict) -> float:
+    started = time.perf_counter()
+    ids = []
+    for _ in range(count):
+        status, body = await request(app, "POST", "/tasks/1/add", task_body, headers)
+        ids.append(int(body.split(b'"id":')[1].split(b",")[0]))
+    for id in ids:
+        await request(app, "PUT", f"/tasks/1/doneupdate/{id}", None, headers)
+    for _ in range(count):
+        await request(app, "POST", "/transactions/add", transaction_body, headers)
+    for id in ids:
+        await request(app, "DELETE", f"/deltask/{id}", None, headers)
+    return time.perf_counter() - started
+
+
+async def batched(count: int, headers: dict) -> float:
+    started = time.perf_counter()
+    status, body = await request(app, "POST", "/batch", {"operations": [{"op": "task.add", "userId": 1, "data": task_body}] * count}, headers)
+    ids = [int(part.split(b",")[0]) for part in body.split(b'"id":')[1:]]
+    await request(app, "POST", "/batch", {"operations": [{"op": "task.done", "id": id, "userId": 1} for id in ids]
+                                          + [{"op": "transaction.add", "data": transaction_body}] * count
+                                          + [{"op": "task.delete", "id": id} for id in ids]}, headers)
+    return time.perf_counter() - started
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    single = await one_by_one(count, prepare(31))
+    batch = await batched(count, prepare(32))
+    print(f"{count} tasks and transactions, {4 * count} changes")
+    print(f"one request each {single * 1000:.1f} ms, two batches {batch * 1000:.1f} ms")
+    for familyId in (31, 32):
+        family = get_family(familyId)
+        user = family.users.get(1)
+        print(f"family {familyId}: {len(family.tasks)} tasks, {len(family.transactions)} transactions, "
+              f"done_tasks {user.done_tasks}, budget {family.state['budget']:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+#Run from the api directory: python -m benchmarks.calendar
+#Calendar range queries and conflict checks for one busy user: the interval index against
+#scanning the user's events. The index should follow the number of results.
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import database
+from models_database import Event
+from store import Table
+
+EVENTS = [1_000, 10_000, 100_000]
+CALLS = 20
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def fill(count: int) -> Table:
+    rand = random.Random(0)
+    table = Table(indexes=database.event_indexes())
+    for id in range(1, count + 1):
+        #Mostly an hour or two, a few multi-day trips
+        starttime = START + timedelta(minutes=rand.randrange(count * 60))
+        length = timedelta(days=rand.randrange(1, 5)) if rand.random() < 0.01 else timedelta(minutes=rand.randrange(30, 180))
+        table.add(Event(id=id, name="Bench", starttime=starttime, endtime=starttime + length, description="",
+                        participating=[rand.choice([2, 3])], created_by=1))
+    return table
+
+
+def scanning(table: Table, start: datetime, end: datetime) -> list[int]:
+    return [event.id for event in sorted(table.lookup("starttime", 1), key=lambda e: e.starttime)
+            if event.starttime < end and event.endtime > start]
+
+
+def timed(query) -> tuple[float, int]:
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        found = query()
+    return (time.perf_counter() - started) / CALLS * 1000, len(found)
+
+
+def main():
+    print(f"{'events':>7} {'query':>9} {'found':>6} {'index ms':>9} {'scan ms':>9}")
+    for count in EVENTS:
+        table = fill(count)
+        calendar = table.indexes["calendar"]
+        start = START + timedelta(minutes=count * 30)
+        for label, length in [("conflict", timedelta(hours=1)), ("day", timedelta(days=1)), ("week", timedelta(days=7))]:
+            end = start + length
+            index_ms, found = timed(lambda: calendar.between(1, start, end))
+            scan_ms, _ = timed(lambda: scanning(table, start, end))
+            print(f"{count:>7} {label:>9} {found:>6} {index_ms:>9.3f} {scan_ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#Run from the api directory: python -m benchmarks.compare old.json new.json [--threshold 10]
+#Lines up two result files of the same benchmark and flags results that got slower.
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path) as source:
+        return json.load(source)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="p50_us")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slower that counts as a regression")
+    args = parser.parse_args()
+
+    old, new = load(args.old), load(args.new)
+    if old["benchmark"] != new["benchmark"]:
+        sys.exit(f"can't compare {old['benchmark']} with {new['benchmark']} results")
+    before = {(result["name"], result["size"]): result for result in old["results"]}
+
+    regressions = 0
+    print(f"{old['commit']} -> {new['commit']}, {args.metric}")
+    for result in new["results"]:
+        previous = before.get((result["name"], result["size"]))
+        if previous is None or not previous[args.metric]:
+            continue
+        change = (result[args.metric] - previous[args.metric]) / previous[args.metric] * 100
+        flag = "  <- slower" if change > args.threshold else ""
+        regressions += bool(flag)
+        print(f"{result['size']:>7} {result['name']:<56} {previous[args.metric]:>10.1f} {result[args.metric]:>10.1f} {change:>+7.1f}%{flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#Run from the api directory: python -m benchmarks.endpoints [--output endpoints.json]
+#Calls every endpoint in-process at several dataset sizes, each size in its own generated family.
+import argparse
+import asyncio
+import time
+
+from app import app
+from benchmarks.asgi import request
+from benchmarks.generator import generate
+from benchmarks.report import summarize, write_results
+
+SIZES = [100, 1_000, 10_000]
+CALLS = 100
+
+task_body = {"name": "Bench", "description": "", "deadline": "2025-01-01T10:00:00", "priority": 2,
+             "repeatable": False, "repeatabletype": 0, "participating": [1, 2]}
+event_body = {"name": "Bench", "starttime": "2025-01-01T10:00:00", "endtime": "2025-01-01T12:00:00",
+              "description": "", "participating": [1, 2]}
+
+
+def cases(family) -> list[tuple[str, str, object]]:
+    #(method, route, call number -> (url, body)); reads first, deletes take a fresh row per call
+    taskIds = [task.id for task in family.tasks]
+    eventIds = [event.id for event in family.events]
+    transactionIds = [transaction.id for transaction in family.transactions]
+    jarIds = [jar.id for jar in family.jars]
+    return [
+        ("GET", "/users_all", lambda i: ("/users_all", None)),
+        ("GET", "/user/{userId}", lambda i: ("/user/1", None)),
+        ("GET", "/user/achievements/{userId}", lambda i: ("/user/achievements/1", None)),
+        ("GET", "/tasks/{userId}", lambda i: ("/tasks/1", None)),
+        ("GET", "/tasks/{userId}?filter=priority", lambda i: ("/tasks/1?filter=priority", None)),
+        ("GET", "/task/{taskId}", lambda i: (f"/task/{taskIds[i % len(taskIds)]}", None)),
+        ("GET", "/events/{userId}", lambda i: ("/events/1", None)),
+        ("GET", "/events_last/{userId}", lambda i: ("/events_last/1", None)),
+        ("GET", "/event/{eventId}", lambda i: (f"/event/{eventIds[i % len(eventIds)]}", None)),
+        ("GET", "/transactions", lambda i: ("/transactions", None)),
+        ("GET", "/transactions?limit=50", lambda i: ("/transactions?limit=50", None)),
+        ("GET", "/transactions?filter=amount&trantype=outcome", lambda i: ("/transactions?filter=amount&trantype=outcome", None)),
+        ("GET", "/transaction/{transactionId}", lambda i: (f"/transaction/{transactionIds[i % len(transactionIds)]}", None)),
+        ("GET", "/transaction_last", lambda i: ("/transaction_last", None)),
+        ("GET", "/jars", lambda i: ("/jars", None)),
+        ("GET", "/jars/highest", lambda i: ("/jars/highest", None)),
+        ("GET", "/jar/{jarId}", lambda i: (f"/jar/{jarIds[i % len(jarIds)]}", None)),
+        ("GET", "/type/{relate}", lambda i: ("/type/transaction", None)),
+        ("GET", "/budget", lambda i: ("/budget", None)),
+        ("GET", "/budget/statistics", lambda i: ("/budget/statistics", None)),
+        ("GET", "/budget/statistics/months", lambda i: ("/budget/statistics/months?start=2023-01&end=2024-12", None)),
+        ("GET", "/budget/statistics/categories", lambda i: ("/budget/statistics/categories?start=2023-01&end=2024-12", None)),
+        ("GET", "/sync", lambda i: ("/sync", None)),
+        ("GET", "/dashboard/{userId}", lambda i: ("/dashboard/1", None)),
+        ("POST", "/user/add", lambda i: ("/user/add", {"name": "Bench", "surname": "Bench", "role": "Son", "dob": "2010-01-01"})),
+        ("PUT", "/user/{userId}/avatar/{avatarId}", lambda i: (f"/user/1/avatar/{i % 6 + 1}.png", None)),
+        ("POST", "/tasks/{userId}/add", lambda i: ("/tasks/1/add", task_body)),
+        ("PUT", "/tasks/update/{taskId}", lambda i: (f"/tasks/update/{taskIds[i % len(taskIds)]}", task_body)),
+        ("PUT", "/tasks/{userId}/doneupdate/{taskId}", lambda i: (f"/tasks/1/doneupdate/{taskIds[i % len(taskIds)]}", None)),
+        ("POST", "/events/{userId}/add", lambda i: ("/events/1/add", event_body)),
+        ("PUT", "/events/update/{eventId}", lambda i: (f"/events/update/{eventIds[i % len(eventIds)]}", event_body)),
+        ("POST", "/transactions/add", lambda i: ("/transactions/add", {"amount": 10 + i % 7, "isIncome": i % 2 == 0, "dtype": "Groceries"})),
+        ("POST", "/jars/add", lambda i: ("/jars/add", {"target": "Bench", "totalamount": 1000, "deadline": "2026-01-01"})),
+        ("PUT", "/jars/{jarId}/deadline", lambda i: (f"/jars/{jarIds[i % len(jarIds)]}/deadline", {"deadline": "2026-06-01"})),
+        ("PUT", "/jars/{jarId}/amount", lambda i: (f"/jars/{jarIds[i % len(jarIds)]}/amount", {"currentamount": 100 + i % 2, "totalamount": 5000})),
+        ("POST", "/type/{relate}/add", lambda i: ("/type/transaction/add", {"name": f"Bench{i}", "relate": "transaction"})),
+        ("PUT", "/budget/update", lambda i: ("/budget/update", {"amount": 1000 + i})),
+        ("DELETE", "/deltask/{taskId}", lambda i: (f"/deltask/{taskIds[-1 - i]}", None)),
+        ("DELETE", "/delevent/{eventId}", lambda i: (f"/delevent/{eventIds[-1 - i]}", None)),
+        ("DELETE", "/deltransaction/{transactionId}", lambda i: (f"/deltransaction/{transactionIds[-1 - i]}", None)),
+        ("DELETE", "/deljar/{jarId}", lambda i: (f"/deljar/{jarIds[-1 - i]}", None)),
+    ]
+
+
+async def run(sizes: list[int], calls: int) -> list[dict]:
+    results = []
+    for number, size in enumerate(sizes):
+        familyId = 1_000 + number
+        family = generate(familyId, users=5, tasks=size, events=size, transactions=size, jars=max(calls, size // 100))
+        headers = {"X-Family-Id": str(familyId)}
+        for method, route, make in cases(family):
+            samples = []
+            for i in range(calls):
+                url, body = make(i)
+                started = time.perf_counter()
+                status, _ = await request(app, method, url, body, headers)
+                samples.append(time.perf_counter() - started)
+                if status >= 400:
+                    raise RuntimeError(f"{method} {url} answered {status}")
+            results.append({"name": f"{method} {route}", "size": size, **summarize(samples)})
+            print(f"{size:>7} {method:>6} {route:<48} {results[-1]['p50_us']:>9.1f} {results[-1]['p99_us']:>9.1f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process benchmark of every endpoint")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="tasks, events and transactions per family")
+    parser.add_argument("--calls", type=int, default=CALLS)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+    print(f"{'size':>7} {'method':>6} {'route':<48} {'p50 us':>9} {'p99 us':>9}")
+    results = asyncio.run(run(args.sizes, args.calls))
+    if args.output:
+        write_results(args.output, "endpoints", {"sizes": args.sizes, "calls": args.calls}, results)
+
+
+if __name__ == "__main__":
+    main()
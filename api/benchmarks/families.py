@@ -0,0 +1,55 @@
+#Run from the api directory: python -m benchmarks.families
+#Fills more and more families with a small household each and checks that memory grows
+#by a fixed amount per family while requests of one family don't get slower.
+import asyncio
+import gc
+import time
+import tracemalloc
+
+import database
+from app import app
+from benchmarks.asgi import request
+
+SIZES = [100, 1_000, 3_000]
+CALLS = 200
+
+
+async def fill_family(familyId: int):
+    database.create_family(familyId)
+    headers = {"X-Family-Id": str(familyId)}
+    for name in ("Anna", "Lukas", "Noa"):
+        await request(app, "POST", "/user/add", {"name": name, "surname": "Bench", "role": "Parent", "dob": "1980-01-01"}, headers)
+    for i in range(10):
+        await request(app, "POST", "/tasks/1/add", {"name": "Bench", "description": "", "deadline": "2025-01-01T10:00:00", "priority": i % 3 + 1,
+                                                    "repeatable": False, "repeatabletype": 0, "participating": [2, 3]}, headers)
+        await request(app, "POST", "/transactions/add", {"amount": 10 + i, "isIncome": i % 2 == 0, "dtype": "Groceries"}, headers)
+
+
+async def measure(familyId: int) -> float:
+    headers = {"X-Family-Id": str(familyId)}
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        await request(app, "GET", "/tasks/1", headers=headers)
+        await request(app, "POST", "/transactions/add", {"amount": 1, "isIncome": True, "dtype": "Work"}, headers)
+    return (time.perf_counter() - started) / CALLS / 2 * 1_000_000
+
+
+async def main():
+    #In memory every family stays loaded
+    database.max_families = SIZES[-1]
+    filled = 1
+    print(f"{'families':>9} {'KB/family':>10} {'family 1 us':>11} {'newest us':>11}")
+    for size in SIZES:
+        tracemalloc.start()
+        for familyId in range(filled + 1, size + 1):
+            await fill_family(familyId)
+        per_family = tracemalloc.get_traced_memory()[0] / (size - filled) / 1024
+        tracemalloc.stop()
+        #Long lived rows, otherwise every full collection walks all families again
+        gc.freeze()
+        filled = size
+        print(f"{size:>9} {per_family:>10.1f} {await measure(1):>11.1f} {await measure(size):>11.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+#Fills one family with random but repeatable rows, run from the api directory:
+#python -m benchmarks.generator --family 2 --tasks 10000 --transactions 50000
+import argparse
+import random
+from datetime import date, datetime, timedelta
+
+from database import Family, create_family, family_exists, get_family
+from models_database import Event, Jar, Task, Transaction, Type, User
+
+NAMES = ["Anna", "Lukas", "Noa", "Mia", "Elias", "Lena", "Paul", "Emma"]
+ROLES = ["Mother", "Father", "Son", "Daughter", "Grandma", "Grandpa"]
+DTYPES = ["Work", "Transport", "Groceries", "Fun", "Rent", "Jar"]
+START = datetime(2023, 1, 1, 8, 0)
+DAYS = 730
+
+
+def open_family(familyId: int) -> Family:
+    return get_family(familyId) if family_exists(familyId) else create_family(familyId)
+
+
+def generate(familyId: int, users: int = 5, tasks: int = 1_000, events: int = 1_000, transactions: int = 1_000,
+             jars: int = 10, seed: int = 0) -> Family:
+    family = open_family(familyId)
+    rand = random.Random(seed)
+
+    def moment() -> datetime:
+        return START + timedelta(days=rand.randrange(DAYS), minutes=rand.randrange(12 * 60))
+
+    def members(userIds: list[int]) -> list[int]:
+        return sorted(rand.sample(userIds, rand.randint(1, len(userIds))))
+
+    for name in DTYPES:
+        if not any(dtype.name == name for dtype in family.dtypes):
+            family.dtypes.add(Type(id=family.ids.next("dtypes_id"), name=name, relate="transaction"))
+
+    for _ in range(users):
+        family.users.add(User(id=family.ids.next("users_id"), avatar_id=f"{rand.randint(1, 6)}.png", name=rand.choice(NAMES),
+                              surname="Generated", role=rand.choice(ROLES), dob=date(1960 + rand.randrange(50), rand.randint(1, 12), rand.randint(1, 28))))
+    userIds = [user.id for user in family.users]
+
+    for _ in range(tasks):
+        created = moment()
+        family.tasks.add(Task(id=family.ids.next("tasks_id"), name="Generated task", description="", datecreation=created.date(),
+                              deadline=created + timedelta(days=rand.randint(1, 30)), priority=rand.randint(1, 3),
+                              repeatable=False, repeatabletype=0, participating=members(userIds),
+                              done=rand.random() < 0.3, created_by=rand.choice(userIds)))
+
+    for _ in range(events):
+        starttime = moment()
+        family.events.add(Event(id=family.ids.next("events_id"), name="Generated event", starttime=starttime,
+                                endtime=starttime + timedelta(hours=rand.randint(1, 4)), description="",
+                                participating=members(userIds), created_by=rand.choice(userIds)))
+
+    jarRows = []
+    for _ in range(jars):
+        jar = Jar(id=family.ids.next("jars_id"), target="Generated jar", totalamount=rand.randint(5, 50) * 100.0,
+                  currentamount=0.0, deadline=(START + timedelta(days=DAYS + rand.randrange(365))).date())
+        family.jars.add(jar)
+        jarRows.append(jar)
+
+    for _ in range(transactions):
+        jar = rand.choice(jarRows) if jarRows and rand.random() < 0.1 else None
+        isIncome = jar is None and rand.random() < 0.3
+        amount = round(rand.uniform(5, 3000 if isIncome else 300), 2)
+        transaction = Transaction(id=family.ids.next("transactions_id"), amount=amount if isIncome else -amount,
+                                  datecreation=moment(), isIncome=isIncome, jarId=jar.id if jar else None,
+                                  dtype="Jar" if jar else rand.choice(DTYPES[:-1]))
+        family.transactions.add(transaction)
+        family.state.increment("budget", transaction.amount)
+        if jar:
+            jar.currentamount += amount
+    for jar in jarRows:
+        family.jars.update(jar)
+    return family
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a family with generated rows")
+    parser.add_argument("--family", type=int, default=2)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--tasks", type=int, default=1_000)
+    parser.add_argument("--events", type=int, default=1_000)
+    parser.add_argument("--transactions", type=int, default=1_000)
+    parser.add_argument("--jars", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    family = open_family(args.family)
+    family.storage.begin()
+    try:
+        generate(args.family, args.users, args.tasks, args.events, args.transactions, args.jars, args.seed)
+    finally:
+        family.storage.commit()
+    print(", ".join(f"{table.name}: {len(table)}" for table, model in family.tables))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#Run from the api directory: python -m benchmarks.jars 100000
+#The fullest jar with its transactions, and finding a jar's transactions on delete: the
+#jar and progress indexes against scanning every transaction like before.
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import database
+from models_database import Jar, Transaction
+from store import Table
+
+JARS = 20
+CALLS = 20
+
+
+def fill(count: int) -> tuple[Table, Table]:
+    rand = random.Random(0)
+    jars = Table(indexes=database.jar_indexes())
+    for id in range(1, JARS + 1):
+        jars.add(Jar(id=id, target="Bench", totalamount=1000.0, currentamount=0.0, deadline=date(2030, 1, 1)))
+    transactions = Table(indexes=database.transaction_indexes())
+    for id in range(1, count + 1):
+        jarId = rand.randrange(1, JARS + 1) if rand.random() < 0.05 else None
+        transactions.add(Transaction(id=id, amount=-round(rand.uniform(5, 50), 2), isIncome=False, jarId=jarId, dtype="Jar" if jarId else "Fun",
+                                     datecreation=datetime(2024, 1, 1) + timedelta(minutes=id)))
+        if jarId:
+            jar = jars.get(jarId)
+            jar.currentamount += abs(transactions.get(id).amount) / 100
+            jars.update(jar)
+    return jars, transactions
+
+
+def timed(call) -> float:
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        call()
+    return (time.perf_counter() - started) / CALLS * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    jars, transactions = fill(count)
+
+    def highest_scan():
+        jar = max(jars, key=lambda jar: (jar.currentamount / jar.totalamount * 100) if jar.totalamount > 0 else 0)
+        return [transaction for transaction in transactions if transaction.jarId == jar.id]
+
+    def highest_index():
+        jar = jars.lookup("progress", "all", 1, reverse=True)[0]
+        return transactions.lookup("jar", jar.id)
+
+    assert highest_scan() == highest_index()
+    print(f"{count} transactions, {JARS} jars")
+    print(f"{'':>22} {'scan ms':>9} {'index ms':>9}")
+    print(f"{'/jars/highest':>22} {timed(highest_scan):>9.3f} {timed(highest_index):>9.3f}")
+    print(f"{'jar transactions':>22} {timed(lambda: [t for t in transactions if t.jarId == 1]):>9.3f} "
+          f"{timed(lambda: transactions.lookup('jar', 1)):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
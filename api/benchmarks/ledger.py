@@ -0,0 +1,83 @@
+#Run from the api directory: python -m benchmarks.ledger 100000
+#Same transactions in a table with the sorted indexes and in one with the columnar ledger:
+#index memory, cost of a write, and listings/statistics the first time, right after a write
+#and when warm.
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import database
+from models_database import Transaction
+from store import Table
+
+DTYPES = ["Work", "Transport", "Groceries", "Fun", "Rent"]
+CALLS = 20
+
+
+def generate(count: int) -> list[Transaction]:
+    rand = random.Random(0)
+    rows = []
+    for id in range(1, count + 1):
+        isIncome = rand.random() < 0.3
+        amount = round(rand.uniform(5, 300), 2)
+        rows.append(Transaction(id=id, amount=amount if isIncome else -amount, isIncome=isIncome, dtype=rand.choice(DTYPES),
+                                datecreation=datetime(2023, 1, 1) + timedelta(minutes=rand.randrange(730 * 24 * 60))))
+    return rows
+
+
+def timed(call, after_write=None) -> float:
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        if after_write:
+            after_write()
+        call()
+    return (time.perf_counter() - started) / CALLS * 1000
+
+
+def measure(layout: str, rows: list[Transaction]) -> dict:
+    database.transaction_layout = layout
+    tracemalloc.start()
+    table = Table(rows, database.transaction_indexes())
+    memory = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    #Long lived rows, otherwise every full collection walks them and drowns the numbers
+    gc.collect()
+    gc.freeze()
+
+    extra = replace(rows[0])
+    def write():
+        table.remove(extra.id)
+        table.add(extra)
+
+    reads = {
+        "newest 50": lambda: table.lookup("datecreation", ("all", None), 50, reverse=True),
+        "outcome Rent 50": lambda: table.lookup("datecreation", ("outcome", "Rent"), 50, reverse=True),
+        "biggest 50": lambda: table.lookup("amount", "all", 50, reverse=True),
+        "months": lambda: list(table.indexes["month"].range((2023, 1), (2025, 1))),
+    }
+    results = {"index MB": memory, "write ms": timed(write)}
+    for name, read in reads.items():
+        started = time.perf_counter()
+        read()
+        results[f"{name} ms (first)"] = (time.perf_counter() - started) * 1000
+        results[f"{name} ms (after write)"] = timed(read, write)
+        results[f"{name} ms (warm)"] = timed(read)
+    return results
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rows = generate(count)
+    results = {layout: measure(layout, rows) for layout in ("indexes", "columnar")}
+    print(f"{count} transactions")
+    print(f"{'':>32} {'indexes':>10} {'columnar':>10}")
+    for name in results["indexes"]:
+        print(f"{name:>32} {results['indexes'][name]:>10.3f} {results['columnar'][name]:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
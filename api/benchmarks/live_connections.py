@@ -0,0 +1,92 @@
+#Run from the api directory: python -m benchmarks.live_connections [connections]
+#Starts one uvicorn worker, holds that many idle /live streams open, then times how
+#long one new transaction takes to reach all of them.
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+CONNECTIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+ROUNDS = 5
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def http(port: int, method: str, path: str, body=None) -> bytes:
+    payload = json.dumps(body).encode() if body is not None else b""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+async def listen(port: int, userId: int):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /live/{userId}/stream HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+    await reader.readuntil(b"\r\n\r\n")
+    return reader, writer
+
+
+async def receive(reader):
+    while not (await reader.readline()).startswith(b"data:") and not reader.at_eof():
+        pass
+
+
+async def wait_for_server(port: int):
+    for _ in range(100):
+        try:
+            await http(port, "GET", "/budget")
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def main():
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+                              env={**os.environ, "STORAGE": "memory"})
+    try:
+        await wait_for_server(port)
+        idle_mb = rss_mb(server.pid)
+        started = time.perf_counter()
+        streams = []
+        for start in range(0, CONNECTIONS, 200):
+            streams += await asyncio.gather(*(listen(port, 1 + i % 3) for i in range(start, min(start + 200, CONNECTIONS))))
+        print(f"{CONNECTIONS} streams open in {time.perf_counter() - started:.1f} s, "
+              f"server memory {idle_mb:.0f} MB -> {rss_mb(server.pid):.0f} MB")
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            await http(port, "POST", "/transactions/add", {"amount": 10, "isIncome": False, "dtype": "Groceries"})
+            await asyncio.gather(*(receive(reader) for reader, writer in streams))
+            print(f"one transaction reached all streams in {(time.perf_counter() - started) * 1000:.0f} ms")
+        for reader, writer in streams:
+            writer.close()
+        await asyncio.gather(*(writer.wait_closed() for reader, writer in streams))
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
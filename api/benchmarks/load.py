@@ -0,0 +1,135 @@
+#Run from the api directory: python -m benchmarks.load [--url http://127.0.0.1:8000] [--output load.json]
+#Mixed read/write traffic from many concurrent clients for a fixed time. Without --url the
+#app is called in-process on a generated family, with --url a running server is used.
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.report import summarize, write_results
+
+task_body = {"name": "Load", "description": "", "deadline": "2025-01-01T10:00:00", "priority": 2,
+             "repeatable": False, "repeatabletype": 0, "participating": [1, 2]}
+
+#(name, weight, method, call number -> (url, body)); the read weights add up to 80
+OPERATIONS = [
+    ("tasks", 20, "GET", lambda rand: (f"/tasks/{rand.randint(1, 3)}?limit=20", None)),
+    ("events", 15, "GET", lambda rand: (f"/events/{rand.randint(1, 3)}", None)),
+    ("transactions", 15, "GET", lambda rand: ("/transactions?limit=50", None)),
+    ("jars", 10, "GET", lambda rand: ("/jars?transactions_limit=5", None)),
+    ("budget", 10, "GET", lambda rand: ("/budget", None)),
+    ("dashboard", 10, "GET", lambda rand: (f"/dashboard/{rand.randint(1, 3)}?fields=user,budget,transaction_last,events_last", None)),
+    ("add_transaction", 10, "POST", lambda rand: ("/transactions/add", {"amount": rand.randint(1, 200), "isIncome": rand.random() < 0.3, "dtype": "Groceries"})),
+    ("add_task", 5, "POST", lambda rand: (f"/tasks/{rand.randint(1, 3)}/add", task_body)),
+    ("update_budget", 5, "PUT", lambda rand: ("/budget/update", {"amount": rand.randint(1000, 5000)})),
+]
+
+
+class InProcess:
+    def __init__(self, familyId: int):
+        from app import app
+        from benchmarks.asgi import request
+        self._app = app
+        self._request = request
+        self._headers = {"X-Family-Id": str(familyId)}
+
+    async def send(self, method: str, url: str, body) -> int:
+        status, _ = await self._request(self._app, method, url, body, self._headers)
+        return status
+
+    async def close(self):
+        pass
+
+
+class HTTPConnection:
+    #Minimal keep-alive HTTP/1.1 client, enough for this API's JSON responses
+    def __init__(self, url: str, familyId: int):
+        parts = urlsplit(url)
+        self._host = parts.hostname
+        self._port = parts.port or 80
+        self._familyId = familyId
+        self._streams = None
+
+    async def send(self, method: str, url: str, body) -> int:
+        if self._streams is None:
+            self._streams = await asyncio.open_connection(self._host, self._port)
+        reader, writer = self._streams
+        payload = json.dumps(body).encode() if body is not None else b""
+        writer.write(f"{method} {url} HTTP/1.1\r\nHost: {self._host}\r\nX-Family-Id: {self._familyId}\r\n"
+                     f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload)
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        headers = {line.split(":", 1)[0].lower(): line.split(":", 1)[1].strip() for line in head[1:] if ":" in line}
+        if headers.get("transfer-encoding") == "chunked":
+            while size := int((await reader.readline()).strip(), 16):
+                await reader.readexactly(size + 2)
+            await reader.readline()
+        else:
+            await reader.readexactly(int(headers.get("content-length", 0)))
+        return int(head[0].split()[1])
+
+    async def close(self):
+        if self._streams is not None:
+            self._streams[1].close()
+
+
+async def client(connection, seed: int, deadline: float, samples: dict, errors: dict):
+    rand = random.Random(seed)
+    names = [operation[0] for operation in OPERATIONS]
+    weights = [operation[1] for operation in OPERATIONS]
+    operations = {operation[0]: operation for operation in OPERATIONS}
+    while time.perf_counter() < deadline:
+        name, weight, method, make = operations[rand.choices(names, weights)[0]]
+        url, body = make(rand)
+        started = time.perf_counter()
+        status = await connection.send(method, url, body)
+        samples[name].append(time.perf_counter() - started)
+        if status >= 400:
+            errors[name] = errors.get(name, 0) + 1
+    await connection.close()
+
+
+async def run(args) -> tuple[float, dict, dict]:
+    if args.url is None:
+        from benchmarks.generator import generate
+        generate(args.family, users=5, tasks=args.size, events=args.size, transactions=args.size, jars=10)
+    samples = {operation[0]: [] for operation in OPERATIONS}
+    errors = {}
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        client(HTTPConnection(args.url, args.family) if args.url else InProcess(args.family), number, deadline, samples, errors)
+        for number in range(args.concurrency)
+    ))
+    return time.perf_counter() - started, samples, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent mixed read/write load")
+    parser.add_argument("--url", help="running server, e.g. http://127.0.0.1:8000 (default: in-process)")
+    parser.add_argument("--family", type=int, default=1_000, help="family the load runs against")
+    parser.add_argument("--size", type=int, default=10_000, help="generated tasks, events and transactions (in-process only)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    elapsed, samples, errors = asyncio.run(run(args))
+    total = [sample for operation in samples.values() for sample in operation]
+    size = args.size if args.url is None else None
+    results = [{"name": "all", "size": size, "throughput_rps": round(len(total) / elapsed, 1), "errors": sum(errors.values()), **summarize(total)}]
+    results += [{"name": name, "size": size, "errors": errors.get(name, 0), **summarize(operation)}
+                for name, operation in samples.items() if operation]
+
+    print(f"{results[0]['throughput_rps']:.0f} requests/s over {elapsed:.1f} s with {args.concurrency} clients")
+    print(f"{'operation':<16} {'count':>7} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'errors':>7}")
+    for result in results:
+        print(f"{result['name']:<16} {result['count']:>7} {result['p50_us']:>9.1f} {result['p95_us']:>9.1f} {result['p99_us']:>9.1f} {result['errors']:>7}")
+    if args.output:
+        settings = {"url": args.url, "family": args.family, "size": args.size, "concurrency": args.concurrency, "duration": args.duration}
+        write_results(args.output, "load", settings, results)
+
+
+if __name__ == "__main__":
+    main()
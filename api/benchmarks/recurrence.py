@@ -0,0 +1,63 @@
+#Run from the api directory: python -m benchmarks.recurrence
+#Occurrence queries against many repeating tasks of one user: the schedule index against
+#stepping through every series. The schedule's cost should follow the number of results.
+import random
+import time
+from datetime import datetime, timedelta
+
+import database
+from models_database import Task
+from recurrence import task_rule
+from store import Table
+
+SERIES = [1_000, 10_000]
+CALLS = 20
+START = datetime(2024, 1, 1)
+
+
+def fill(count: int) -> Table:
+    rand = random.Random(0)
+    table = Table(indexes=database.task_indexes())
+    for id in range(1, count + 1):
+        #Mostly daily series, some weekly and monthly ones
+        kind = rand.choice([1, 1, 1, 2, 3])
+        deadline = START + timedelta(days=rand.randrange(30), minutes=rand.randrange(24 * 60))
+        table.add(Task(id=id, name="Bench", description="", datecreation=START.date(), deadline=deadline, priority=2,
+                       repeatable=True, repeatabletype=kind, participating=[1], done=False, created_by=1))
+    return table
+
+
+def stepping(table: Table, start: datetime, end: datetime) -> list:
+    found = []
+    for task in table:
+        rule = task_rule(task)
+        moment = task.deadline if task.deadline >= start else rule.next_after(start - timedelta(microseconds=1))
+        while moment < end:
+            found.append((moment, task.id))
+            moment = rule.next_after(moment)
+    return sorted(found)
+
+
+def timed(query) -> tuple[float, int]:
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        found = query()
+    return (time.perf_counter() - started) / CALLS * 1000, len(found)
+
+
+def main():
+    print(f"{'series':>7} {'range':>8} {'found':>7} {'schedule ms':>12} {'stepping ms':>12}")
+    for count in SERIES:
+        table = fill(count)
+        schedule = table.indexes["schedule"]
+        start = datetime(2024, 6, 3, 12)
+        for label, length in [("1 min", timedelta(minutes=1)), ("1 hour", timedelta(hours=1)), ("1 day", timedelta(days=1)),
+                              ("1 week", timedelta(days=7))]:
+            end = start + length
+            schedule_ms, found = timed(lambda: schedule.between(1, start, end))
+            stepping_ms, _ = timed(lambda: stepping(table, start, end))
+            print(f"{count:>7} {label:>8} {found:>7} {schedule_ms:>12.3f} {stepping_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#Run from the api directory: python -m benchmarks.reminders 200000
+#Reminder timers of many open tasks: cost of scheduling them, of moving a deadline and of
+#closing a task, then how late reminders fire while all of them are pending.
+import asyncio
+import random
+import sys
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+import database
+from models_database import Task
+from reminders import ReminderIndex, Reminders
+from store import Table
+
+FIRING = 1_000
+SPREAD = 2.0
+CALLS = 10_000
+
+
+class LatenessSink:
+    def __init__(self):
+        self.late = []
+
+    async def deliver(self, notification: dict):
+        self.late.append(time.time() - datetime.fromisoformat(notification["due"]).timestamp())
+
+
+def task(id: int, deadline: datetime) -> Task:
+    return Task(id=id, name="Bench", description="", datecreation=deadline.date(), deadline=deadline, priority=2,
+                repeatable=False, repeatabletype=0, participating=[1], done=False, created_by=1)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rand = random.Random(0)
+    now = datetime.now(timezone.utc)
+    sink = LatenessSink()
+    reminders = Reminders(sink)
+    table = Table([], {}, name="tasks")
+
+    started = time.perf_counter()
+    table.add_index("reminders", ReminderIndex(reminders, 1, table, database.task_timers, database.open_task_members))
+    for id in range(1, count + 1):
+        table.add(task(id, now + timedelta(days=1, minutes=rand.randrange(60 * 24 * 60))))
+    schedule_us = (time.perf_counter() - started) / count * 1e6
+
+    ids = [rand.randrange(1, count + 1) for _ in range(CALLS)]
+    started = time.perf_counter()
+    for id in ids:
+        table.update(replace(table.get(id), deadline=now + timedelta(days=2, minutes=rand.randrange(60 * 24 * 60))))
+    reschedule_us = (time.perf_counter() - started) / CALLS * 1e6
+
+    started = time.perf_counter()
+    for id in ids[:CALLS // 2]:
+        table.update(replace(table.get(id), done=True))
+    done_us = (time.perf_counter() - started) / (CALLS // 2) * 1e6
+
+    #Deadlines within the next seconds, the overdue timer of each one is measured
+    lead = database.reminder_lead
+    database.reminder_lead = timedelta(days=1)
+    soon = datetime.now(timezone.utc) + timedelta(seconds=0.5)
+    for n in range(FIRING):
+        table.add(task(count + 1 + n, soon + timedelta(seconds=rand.uniform(0, SPREAD))))
+    database.reminder_lead = lead
+    pending = len(reminders)
+
+    async def run():
+        reminders.start()
+        await asyncio.sleep(SPREAD + 1)
+    asyncio.run(run())
+
+    late = sorted(sink.late)
+    print(f"{pending} timers pending")
+    print(f"schedule {schedule_us:.2f} us/task, move deadline {reschedule_us:.2f} us, close task {done_us:.2f} us")
+    print(f"fired {len(late)}/{FIRING}, late ms: median {late[len(late) // 2] * 1000:.2f}, "
+          f"p99 {late[len(late) * 99 // 100] * 1000:.2f}, max {late[-1] * 1000:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import json
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+
+def summarize(samples: list[float]) -> dict:
+    #Latencies in seconds -> microsecond statistics
+    ordered = sorted(samples)
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1_000_000
+
+    return {
+        "count": len(ordered),
+        "mean_us": round(statistics.fmean(ordered) * 1_000_000, 1),
+        "p50_us": round(percentile(0.50), 1),
+        "p95_us": round(percentile(0.95), 1),
+        "p99_us": round(percentile(0.99), 1),
+    }
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: str, benchmark: str, settings: dict, results: list[dict]):
+    #One file per run; compare two of them with python -m benchmarks.compare old.json new.json
+    document = {
+        "benchmark": benchmark,
+        "commit": commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": settings,
+        "results": results,
+    }
+    with open(path, "w") as output:
+        json.dump(document, output, indent=2)
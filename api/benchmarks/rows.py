@@ -0,0 +1,71 @@
+#Run from the api directory: python -m benchmarks.rows 1000000
+#Bytes per stored row: the pydantic models rows used to be versus the slotted records
+#in models_database, for transactions and for tasks (whose participant lists repeat).
+import gc
+import sys
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from pydantic import BaseModel
+
+from models_database import Task, Transaction
+
+DTYPES = ["Work", "Transport", "Groceries", "Fun", "Rent"]
+START = datetime(2023, 1, 1)
+
+
+class PydanticTransaction(BaseModel):
+    id: int
+    amount: float
+    datecreation: datetime
+    isIncome: bool
+    jarId: int | None = None
+    dtype: str
+
+
+class PydanticTask(BaseModel):
+    id: int
+    name: str
+    description: str
+    datecreation: date
+    deadline: datetime
+    priority: int
+    repeatable: bool
+    repeatabletype: int
+    participating: list[int]
+    done: bool
+    created_by: int
+
+
+def transaction(model, id: int):
+    return model(id=id, amount=-(id % 30_000) / 100, datecreation=START + timedelta(minutes=id), isIncome=id % 3 == 0,
+                 jarId=None, dtype=DTYPES[id % len(DTYPES)])
+
+
+def task(model, id: int):
+    deadline = START + timedelta(minutes=id)
+    return model(id=id, name="Groceries", description="", datecreation=deadline.date(), deadline=deadline, priority=id % 3 + 1,
+                 repeatable=False, repeatabletype=0, participating=[1 + id % 3, 4], done=id % 2 == 0, created_by=1 + id % 4)
+
+
+def bytes_per_row(make, model, count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    rows = [make(model, id) for id in range(1, count + 1)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del rows
+    return size / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{count} rows each")
+    print(f"{'':>12} {'pydantic B/row':>15} {'slotted B/row':>15}")
+    for name, make, before, after in [("transaction", transaction, PydanticTransaction, Transaction),
+                                      ("task", task, PydanticTask, Task)]:
+        print(f"{name:>12} {bytes_per_row(make, before, count):>15.0f} {bytes_per_row(make, after, count):>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#Run from the api directory: python -m benchmarks.serialization
+#Compares building dicts + jsonable_encoder + json.dumps (the old response path)
+#with the cached orjson fragments, for a freshly filled cache and a warm one.
+import json
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+
+from database import transactions
+from models_database import Transaction
+from serializers import encode_transaction, format_transaction, json_response
+
+SIZES = [100, 1_000, 10_000]
+CALLS = 20
+
+
+def fill(count: int):
+    start = datetime(2024, 1, 1, 8, 0)
+    next_id = 1_000_000 + len(transactions)
+    while len(transactions) < count:
+        transactions.add(Transaction(id=next_id, amount=next_id % 500 / 10, datecreation=start + timedelta(minutes=next_id),
+                                     isIncome=next_id % 2 == 0, jarId=None, dtype=str(next_id % 6 + 1)))
+        next_id += 1
+
+
+def old_path(rows) -> bytes:
+    return json.dumps(jsonable_encoder([format_transaction(row) for row in rows])).encode()
+
+
+def new_path(rows) -> bytes:
+    return json_response([encode_transaction(row) for row in rows]).body
+
+
+def measure(render, rows, cold: bool = False) -> float:
+    total = 0.0
+    for _ in range(CALLS):
+        if cold:
+            transactions.indexes["json"].clear()
+        started = time.perf_counter()
+        render(rows)
+        total += time.perf_counter() - started
+    return total / CALLS * 1000
+
+
+def main():
+    print(f"{'rows':>8} {'old ms':>10} {'cold ms':>10} {'warm ms':>10}")
+    for size in SIZES:
+        fill(size)
+        rows = transactions.all()
+        assert json.loads(old_path(rows)) == json.loads(new_path(rows))
+        print(f"{size:>8} {measure(old_path, rows):>10.2f} {measure(new_path, rows, cold=True):>10.2f} "
+              f"{measure(new_path, rows):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+#Run from the api directory: python -m benchmarks.storage_backends
+#Runs the same mixed workload once per backend, each in a fresh process.
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROUNDS = 2_000
+
+
+async def workload() -> float:
+    from app import app
+    from benchmarks.asgi import request
+
+    task = {"name": "Bench", "description": "", "deadline": "2025-01-01T10:00:00", "priority": 2,
+            "repeatable": False, "repeatabletype": 0, "participating": [1, 2]}
+    started = time.perf_counter()
+    for i in range(ROUNDS):
+        await request(app, "POST", "/transactions/add", {"amount": 10 + i % 7, "isIncome": i % 2 == 0, "dtype": "Groceries"})
+        await request(app, "GET", "/budget")
+        await request(app, "POST", "/tasks/1/add", task)
+        await request(app, "PUT", "/tasks/2/doneupdate/2")
+        await request(app, "GET", "/tasks/3?limit=10")
+        await request(app, "GET", "/user/1")
+    return ROUNDS * 6 / (time.perf_counter() - started)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        for storage in ["memory", f"sqlite:{os.path.join(folder, 'bench.db')}"]:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.storage_backends", "--run"],
+                env={**os.environ, "STORAGE": storage}, capture_output=True, text=True, check=True,
+            ).stdout
+            print(f"{storage.split(':')[0]:>8}: {float(output):>8.0f} requests/s")
+
+
+if __name__ == "__main__":
+    if "--run" in sys.argv:
+        print(asyncio.run(workload()))
+    else:
+        main()
@@ -0,0 +1,89 @@
+#Run from the api directory: python -m benchmarks.transfer 50000
+#Loading a transaction history one POST /transactions/add per row against one streamed
+#/transactions/import, then exporting it again, each in a fresh family.
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+
+from app import app
+from benchmarks.asgi import request
+from database import create_family
+
+DTYPES = ["Work", "Transport", "Groceries", "Fun", "Rent"]
+CHUNK = 64 * 1024
+
+
+def history(count: int) -> list[dict]:
+    rand = random.Random(0)
+    return [{"amount": round(rand.uniform(5, 300), 2), "isIncome": rand.random() < 0.3, "dtype": rand.choice(DTYPES),
+             "datecreation": f"{rand.randrange(1, 29):02}.{rand.randrange(1, 13):02}.2023 {rand.randrange(24):02}:{rand.randrange(60):02}"}
+            for _ in range(count)]
+
+
+async def stream(method: str, url: str, data: bytes, family: int) -> tuple[int, int]:
+    #Like benchmarks.asgi.request, but the body arrives in chunks and only its size is kept
+    path, _, query = url.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [(b"host", b"bench"), (b"content-type", b"text/csv"), (b"x-family-id", str(family).encode())],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    offset = 0
+    status = 0
+    size = 0
+
+    async def receive():
+        nonlocal offset
+        if offset > len(data):
+            #A client that stays connected, streaming responses stop on a disconnect
+            await asyncio.Event().wait()
+        chunk = data[offset:offset + CHUNK]
+        offset += CHUNK
+        return {"type": "http.request", "body": chunk, "more_body": offset < len(data)}
+
+    async def send(message):
+        nonlocal status, size
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, size
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rows = history(count)
+    create_family(21)
+    create_family(22)
+    data = ("amount,isIncome,dtype,datecreation\n" + "".join(f"{r['amount']},{r['isIncome']},{r['dtype']},{r['datecreation']}\n" for r in rows)).encode()
+
+    started = time.perf_counter()
+    for row in rows:
+        await request(app, "POST", "/transactions/add", {key: row[key] for key in ("amount", "isIncome", "dtype")}, {"X-Family-Id": "21"})
+    one_by_one = time.perf_counter() - started
+
+    started = time.perf_counter()
+    status, _ = await stream("POST", "/transactions/import", data, 22)
+    imported = time.perf_counter() - started
+
+    started = time.perf_counter()
+    status, size = await stream("GET", "/transactions/export", b"", 22)
+    exported = time.perf_counter() - started
+    #Second run for the memory, tracing slows it down a lot
+    tracemalloc.start()
+    await stream("GET", "/transactions/export", b"", 22)
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+
+    print(f"{count} transactions, {len(data) / 1024 / 1024:.1f} MB of CSV")
+    print(f"one POST per row {one_by_one:.2f} s, streamed import {imported:.2f} s")
+    print(f"export {exported:.2f} s, {size / 1024 / 1024:.1f} MB, peak traced memory {peak:.1f} MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
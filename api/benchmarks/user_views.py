@@ -0,0 +1,46 @@
+#Run from the api directory: python -m benchmarks.user_views
+#User 1 keeps the same handful of rows while other users' rows grow,
+#so the per-call time should stay flat.
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+
+import app
+from database import events, tasks
+from models_database import Event, Task
+
+SIZES = [1_000, 10_000, 100_000]
+CALLS = 200
+
+
+def fill(count: int):
+    start = datetime(2024, 1, 1, 8, 0)
+    next_id = 1_000_000 + len(tasks)
+    while len(tasks) < count:
+        owner = 100 + next_id % 50
+        tasks.add(Task(id=next_id, name="Bench", description="", datecreation=date(2024, 1, 1),
+                       deadline=start + timedelta(hours=next_id % 5000), priority=next_id % 3 + 1,
+                       repeatable=False, repeatabletype=0, participating=[owner, owner + 1], done=False, created_by=owner))
+        events.add(Event(id=next_id, name="Bench", starttime=start + timedelta(hours=next_id % 5000),
+                         endtime=start + timedelta(hours=next_id % 5000 + 1), description="",
+                         participating=[owner, owner + 1], created_by=owner))
+        next_id += 1
+
+
+async def measure(handler, *args) -> float:
+    started = time.perf_counter()
+    for _ in range(CALLS):
+        await handler(*args)
+    return (time.perf_counter() - started) / CALLS * 1_000_000
+
+
+async def main():
+    print(f"{'rows':>8} {'/tasks/1 us':>12} {'/events/1 us':>13} {'/events_last/1 us':>18}")
+    for size in SIZES:
+        fill(size)
+        print(f"{size:>8} {await measure(app.get_tasks_user, 1):>12.1f} "
+              f"{await measure(app.get_events_user, 1):>13.1f} {await measure(app.get_last_event_user, 1):>18.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
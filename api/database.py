@@ -1,17 +1,53 @@
-from datetime import date, datetime
+import asyncio
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta, timezone
+from operator import attrgetter
+from intervals import Calendar
+from ledger import Ledger, LedgerIndex, LedgerRollup
 from models_database import Achievement, Event, Jar, Task, Transaction, User, Type
+from recurrence import Schedule
+from reminders import MemorySink, ReminderIndex, Reminders
+from storage import open_storage, storage_exists
+from store import ChangeLog, IdAllocator, Index, Rollup, Table, Values
 
-budget: float = 1559.85
+#"memory" (default) or "sqlite:<path>", every family gets its own store
+storage_url = os.environ.get("STORAGE", "memory")
+#Changes, versions and sequence numbers restart with the process and differ between workers
+instance = uuid.uuid4().hex[:8]
+#Changes each family keeps for /sync, older cursors get a full snapshot
+change_log_size = 1_000
+#"indexes" (default) keeps a sorted index per transaction listing, "columnar" keeps
+#transactions in typed arrays and sorts them on the first read after a change
+transaction_layout = os.environ.get("TRANSACTIONS", "indexes")
+#How long before a task's deadline or an event's start the reminder goes out
+reminder_lead = timedelta(minutes=30)
 
-users: list[User] = [
+def as_utc(value: datetime) -> datetime:
+    #Naive times are treated as UTC, same as the endpoints do when formatting
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def event_members(event: Event) -> list[int]:
+    return [event.created_by, *event.participating]
+
+def open_task_members(task: Task) -> list[int]:
+    return [] if task.done else [task.created_by, *task.participating]
+
+def transaction_kinds(transaction: Transaction) -> list[tuple]:
+    #(trantype, dtype) pairs a transaction list can be filtered by, None = any dtype
+    kind = "income" if transaction.isIncome else "outcome"
+    return [("all", None), (kind, None), ("all", transaction.dtype), (kind, transaction.dtype)]
+
+seed_users = [
     User(id=1,avatar_id="1.png", name="Anna", surname="Schneider", role="Mother" ,dob=date(1970, 11, 1),done_tasks=5,created_events=3,created_tasks=12, has_achievement=[1, 4, 5]),
     User(id=2,avatar_id="2.png", name="Lukas", surname="Schneider", role="Father" ,dob=date(1969, 1, 12), done_tasks=4,created_events=5,created_tasks=4,has_achievement=[7]),
     User(id=3,avatar_id="3.png", name="Noa", surname="Schneider", role="Son" ,dob=date(2012, 9, 1), done_tasks=10,created_events=4,created_tasks=4,has_achievement=[1, 2]),
 ]
 
-users_id: int = 4
-
-tasks: list[Task] =[
+seed_tasks = [
     Task(id=1, name="Clean kitchen", description="It has to be done..",             datecreation=date(2024, 11, 1), deadline=datetime(2024,11,2,15,00), priority=1, repeatable=False,repeatabletype=0, participating=[1,2,3],done=False, created_by=1),
     Task(id=2, name="Get out with dog", description="The best time of our day..",   datecreation=date(2024, 11, 1), deadline=datetime(2024,11,2,16,00,00), priority=2, repeatable=True, repeatabletype=1,participating=[1,2,3],done=False, created_by=1),
     Task(id=5, name="Print documents", description="Sorry, i forgot to..",          datecreation=date(2024, 11, 6), deadline=datetime(2024,11,20,20,00,), priority=3, repeatable=False,repeatabletype=0, participating=[2],done=False, created_by=1),
@@ -21,18 +57,37 @@ tasks: list[Task] =[
     Task(id=7, name="Groceries", description="Tomatoes, apples, milk, water, juice, cat food", datecreation=date(2024, 11, 10), deadline=datetime(2024,5,16,18,40), priority=3, repeatable=False,repeatabletype=0, participating=[1,2,3],done=False, created_by=1),
 ]
 
-tasks_id: int = 8
+def task_timers(task: Task) -> list[tuple[str, datetime]]:
+    if task.done:
+        return []
+    return [("reminder", as_utc(task.deadline) - reminder_lead), ("overdue", as_utc(task.deadline))]
+
+def task_indexes() -> dict:
+    return {
+        "deadline": Index(open_task_members, order=lambda t: as_utc(t.deadline)),
+        "priority": Index(open_task_members, order=lambda t: -t.priority),
+        "done": Index(lambda t: [t.done]),
+        "schedule": Schedule(open_task_members),
+    }
 
-events: list[Event] = [
+seed_events = [
     Event(id=1, name="Going to amusement park", starttime=datetime(2024,10,16,18,00), endtime=datetime(2024,10,16,22,00), description="Son wanted for a while", participating=[1,2,3], created_by=1),
     Event(id=2, name="Visit grandma", starttime=datetime(2024,11,3,20,00), endtime=datetime(2024,11,3,22,00), description="", participating=[1,2,3], created_by=1),
     Event(id=3, name="Scene in my school", starttime=datetime(2024,11,4,9,00), endtime=datetime(2024,11,4,11,00), description="We all should really go, you'll like it", participating=[1,2,3], created_by=3),
     Event(id=4, name="Dentist appointment for Noa", starttime=datetime(2024,11,20,14,00), endtime=datetime(2024,11,20,16,30), description="", participating=[3], created_by=1),
 ]
 
-events_id: int = 5
+def event_timers(event: Event) -> list[tuple[str, datetime]]:
+    return [("reminder", as_utc(event.starttime) - reminder_lead), ("started", as_utc(event.starttime))]
 
-transactions: list[Transaction] = [
+def event_indexes() -> dict:
+    return {
+        "starttime": Index(event_members, order=lambda e: as_utc(e.starttime)),
+        "day": Index(event_members, order=lambda e: as_utc(e.starttime).date()),
+        "calendar": Calendar(event_members, lambda e: (as_utc(e.starttime), as_utc(e.endtime) if e.endtime else None)),
+    }
+
+seed_transactions = [
     Transaction(id=1,amount=3020.25,datecreation=datetime(2024,11,1,17,36),isIncome=True,jarId=None,dtype="Work"),
     Transaction(id=2,amount=-104,datecreation=datetime(2024,11,2,9,36),isIncome=False,jarId=None,dtype="Transport"),
     Transaction(id=3,amount=-200,datecreation=datetime(2024,11,3,15,16),isIncome=False,jarId=None,dtype="Groceries"),
@@ -42,15 +97,38 @@ transactions: list[Transaction] = [
     Transaction(id=7,amount=-300,datecreation=datetime(2024,11,8,10,12),isIncome=False,jarId=2,dtype="Jar"),
 ]
 
-transactions_id: int = 8
+def transaction_indexes() -> dict:
+    by_date = lambda t: (as_utc(t.datecreation), t.id)
+    by_amount = lambda t: (t.amount, as_utc(t.datecreation), t.id)
+    by_outcome = lambda t: (abs(t.amount), as_utc(t.datecreation), t.id)
+    kinds = lambda t: ["all", "income" if t.isIncome else "outcome"]
+    outcome = lambda t: [] if t.isIncome else ["outcome"]
+    jar = Index(lambda t: [] if t.jarId is None else [t.jarId], order=by_date)
+    if transaction_layout == "columnar":
+        #Same keys and order as below, answered from the ledger's columns
+        ledger = Ledger()
+        return {
+            "ledger": ledger,
+            "datecreation": LedgerIndex(ledger, transaction_kinds, lambda key: ledger.where(*key), ("times", "ids"), order=by_date),
+            "amount": LedgerIndex(ledger, kinds, ledger.where, ("amounts", "times", "ids"), order=by_amount),
+            "outcome_amount": LedgerIndex(ledger, outcome, lambda kind: ledger.where(kind) if kind == "outcome" else b"",
+                                          ("magnitudes", "times", "ids"), order=by_outcome),
+            "jar": jar,
+            "month": LedgerRollup(ledger),
+        }
+    return {
+        "datecreation": Index(transaction_kinds, order=by_date),
+        "amount": Index(kinds, order=by_amount),
+        "outcome_amount": Index(outcome, order=by_outcome),
+        "jar": jar,
+        "month": Rollup(lambda t: (t.datecreation.year, t.datecreation.month, t.dtype, t.isIncome), lambda t: t.amount),
+    }
 
-jars: list[Jar] = [
-    Jar(id=1, target="Trip to Japan", totalamount=1000.0, currentamount=500.0, deadline=date(2024, 12, 31), has_transactions=[5, 6]),
-    Jar(id=2, target="Buy a new laptop", totalamount=1500.0, currentamount=300.0,deadline=date(2024, 11, 15), has_transactions=[7]),
+seed_jars = [
+    Jar(id=1, target="Trip to Japan", totalamount=1000.0, currentamount=500.0, deadline=date(2024, 12, 31)),
+    Jar(id=2, target="Buy a new laptop", totalamount=1500.0, currentamount=300.0,deadline=date(2024, 11, 15)),
 ]
 
-jars_id: int = 3
-
 achievements: list[Achievement] = [
     Achievement(id=1,name="Not lazy!",description="Done 5 tasks"),
     Achievement(id=2,name="Definitely hard worker!",description="Done 10 tasks"),
@@ -65,11 +143,231 @@ achievements: list[Achievement] = [
     Achievement(id=9,name="Party maker",description="Create 100 events"),
 ]
 
-dtypes: list[Type] =[
+def jar_indexes() -> dict:
+    #Fullest jar last, on a tie the older jar counts as fuller
+    return {"progress": Index(lambda jar: ["all"], order=lambda jar: (jar.currentamount / jar.totalamount * 100 if jar.totalamount > 0 else 0, -jar.id))}
+
+seed_dtypes = [
     Type(id=1, name="Work", relate="transaction"),
     Type(id=2, name="Transport", relate="transaction"),
     Type(id=3, name="Groceries", relate="transaction"),
     Type(id=4, name="Jar", relate="transaction"),
 ]
 
-dtypes_id: int = 6
+state_defaults = {
+    "budget": 1559.85,
+}
+
+#Next free id per table, handed out in blocks by ids
+id_defaults = {
+    "users_id": 4,
+    "tasks_id": 8,
+    "events_id": 5,
+    "transactions_id": 8,
+    "jars_id": 3,
+    "dtypes_id": 6,
+}
+
+#Families other than the first start without any rows
+empty_state = {key: 0.0 for key in state_defaults}
+empty_ids = {key: 1 for key in id_defaults}
+
+
+class Family:
+    #Tables, values and change log of one household. Families share nothing, each has
+    #its own store, write lock and indexes, so a busy family doesn't hold up the others.
+    def __init__(self, id: int, storage, seeded: bool = False):
+        self.id = id
+        self.storage = storage
+        self.instance = f"{instance}.{id}"
+        self.changes = ChangeLog(change_log_size)
+        self.write_lock = asyncio.Lock()
+        self.tables: list[tuple[Table, type]] = []
+        self._locals = {}
+
+        self.users = self.open_table("users", User, seed_users if seeded else [])
+        self.tasks = self.open_table("tasks", Task, seed_tasks if seeded else [], task_indexes())
+        self.events = self.open_table("events", Event, seed_events if seeded else [], event_indexes())
+        self.transactions = self.open_table("transactions", Transaction, seed_transactions if seeded else [], transaction_indexes())
+        self.jars = self.open_table("jars", Jar, seed_jars if seeded else [], jar_indexes())
+        self.dtypes = self.open_table("dtypes", Type, seed_dtypes if seeded else [])
+
+        if not storage.initialized:
+            for key, value in {**(state_defaults if seeded else empty_state), **(id_defaults if seeded else empty_ids)}.items():
+                storage.save_value(key, value)
+            storage.mark_initialized()
+
+        self.state = Values(self.stored_state(), storage, changes=self.changes)
+        self.ids = IdAllocator(storage)
+        self.tasks.add_index("reminders", ReminderIndex(reminders, id, self.tasks, task_timers, open_task_members))
+        self.events.add_index("reminders", ReminderIndex(reminders, id, self.events, event_timers, event_members))
+
+    def open_table(self, name: str, model, seed: list, indexes: dict[str, Index] | None = None) -> Table:
+        #Seed rows are only used (and written out) the first time a storage is opened
+        table = Table(self.storage.load(name, model) if self.storage.initialized else seed, indexes,
+                      name=name, storage=self.storage, changes=self.changes)
+        if not self.storage.initialized:
+            for row in seed:
+                self.storage.save(name, row)
+        self.tables.append((table, model))
+        return table
+
+    def stored_state(self) -> dict:
+        values = self.storage.load_values()
+        return {key: values[key] for key in state_defaults}
+
+    def refresh(self) -> bool:
+        #Pick up rows committed by other workers since the last request
+        if not self.storage.changed():
+            return False
+        self.reload()
+        return True
+
+    def rollback(self) -> bool:
+        #Drop the writes of a failed request: storage goes back to the last commit and the
+        #tables are loaded again from it. Memory storage has no copy, its tables keep them.
+        if not self.storage.rollback():
+            return False
+        self.reload()
+        #Blocks reserved by the dropped transaction are free again for other workers
+        self.ids = IdAllocator(self.storage)
+        return True
+
+    def reload(self):
+        for table, model in self.tables:
+            table.reset(self.storage.load(table.name, model))
+        self.state.reset(self.stored_state())
+
+    def idle(self) -> bool:
+        #Nothing writing and nobody listening (sized locals like live hubs are empty)
+        return not self.write_lock.locked() and not any(len(value) for value in self._locals.values() if hasattr(value, "__len__"))
+
+    def close(self):
+        #Dropped from memory, its reminders stop until it is loaded again
+        for table in (self.tasks, self.events):
+            index = table.indexes["reminders"]
+            index.clear()
+            reminders.indexes.pop(index.prefix, None)
+
+    def local(self, key, factory):
+        #Per family helper objects (caches, subscribers), made when first asked for
+        if key not in self._locals:
+            self._locals[key] = factory(self)
+        return self._locals[key]
+
+
+#Due reminders of every family, the app swaps the sink for one that reaches live connections
+reminders = Reminders(MemorySink())
+
+#Families other than 1 only exist once created with create_family. A worker keeps at most
+#max_families loaded and drops the least recently used idle one to load another, stored
+#families are read back when asked for again. In-memory families can't be dropped, there
+#max_families limits how many can be created.
+max_families = int(os.environ.get("MAX_FAMILIES", "100"))
+
+families: OrderedDict[int, Family] = OrderedDict()
+families_lock = threading.Lock()
+current_family: ContextVar[Family] = ContextVar("current_family")
+
+def family_exists(id: int) -> bool:
+    return id == 1 or id in families or storage_exists(storage_url, id)
+
+def get_family(id: int) -> Family:
+    #LookupError for a family that was never created
+    family = families.get(id)
+    if family is None:
+        with families_lock:
+            if id not in families:
+                if not family_exists(id):
+                    raise LookupError(f"Family {id} does not exist")
+                load_family(id)
+            family = families[id]
+    try:
+        families.move_to_end(id)
+    except KeyError:
+        #Dropped by another thread meanwhile, the caller still gets a working family
+        pass
+    return family
+
+def create_family(id: int) -> Family:
+    #ValueError when it already exists, OverflowError when no more fit in memory
+    with families_lock:
+        if family_exists(id):
+            raise ValueError(f"Family {id} already exists")
+        return load_family(id)
+
+def load_family(id: int) -> Family:
+    #Called with families_lock held
+    if len(families) >= max_families and not drop_idle_family() and storage_url == "memory":
+        raise OverflowError(f"At most {max_families} families")
+    families[id] = Family(id, open_storage(storage_url, id), seeded=id == 1)
+    return families[id]
+
+def drop_idle_family() -> bool:
+    if storage_url == "memory":
+        return False
+    for id, family in families.items():
+        if family.idle():
+            del families[id]
+            family.close()
+            return True
+    return False
+
+def use_family(id: int) -> Family:
+    family = get_family(id)
+    current_family.set(family)
+    return family
+
+def current() -> Family:
+    #Family of the running request, the first family outside of requests (scripts, benchmarks)
+    family = current_family.get(None)
+    return family if family is not None else get_family(1)
+
+
+class Scoped:
+    #Stands in for something of the current family, e.g. tasks -> current().tasks
+    def __init__(self, resolve):
+        self._resolve = resolve
+
+    def __getattr__(self, name: str):
+        return getattr(self._resolve(current()), name)
+
+    def __getitem__(self, key):
+        return self._resolve(current())[key]
+
+    def __setitem__(self, key, value):
+        self._resolve(current())[key] = value
+
+    def __contains__(self, item) -> bool:
+        return item in self._resolve(current())
+
+    def __iter__(self):
+        return iter(self._resolve(current()))
+
+    def __reversed__(self):
+        return reversed(self._resolve(current()))
+
+    def __len__(self) -> int:
+        return len(self._resolve(current()))
+
+def family_local(factory) -> Scoped:
+    #factory(family) made once per family
+    key = object()
+    return Scoped(lambda family: family.local(key, factory))
+
+def refresh() -> bool:
+    return current().refresh()
+
+family = Scoped(lambda family: family)
+storage = Scoped(attrgetter("storage"))
+changes = Scoped(attrgetter("changes"))
+users = Scoped(attrgetter("users"))
+tasks = Scoped(attrgetter("tasks"))
+events = Scoped(attrgetter("events"))
+transactions = Scoped(attrgetter("transactions"))
+jars = Scoped(attrgetter("jars"))
+dtypes = Scoped(attrgetter("dtypes"))
+state = Scoped(attrgetter("state"))
+ids = Scoped(attrgetter("ids"))
+
+get_family(1)
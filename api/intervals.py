@@ -0,0 +1,142 @@
+import random
+from datetime import datetime, timedelta
+
+#An event without an end (or ending when it starts) still takes up this much time
+MOMENT = timedelta(microseconds=1)
+
+
+class Node:
+    __slots__ = ("key", "end", "priority", "max_end", "left", "right")
+
+    def __init__(self, key: tuple, end):
+        self.key = key
+        self.end = end
+        self.priority = random.random()
+        self.max_end = end
+        self.left = None
+        self.right = None
+
+    def update(self):
+        self.max_end = self.end
+        if self.left is not None and self.left.max_end > self.max_end:
+            self.max_end = self.left.max_end
+        if self.right is not None and self.right.max_end > self.max_end:
+            self.max_end = self.right.max_end
+
+
+def split(node: Node | None, key: tuple) -> tuple[Node | None, Node | None]:
+    #(keys < key, keys >= key)
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = split(node.right, key)
+        node.update()
+        return node, right
+    left, node.left = split(node.left, key)
+    node.update()
+    return left, node
+
+
+def merge(left: Node | None, right: Node | None) -> Node | None:
+    #Every key of left is smaller than every key of right
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = merge(left.right, right)
+        left.update()
+        return left
+    right.left = merge(left, right.left)
+    right.update()
+    return right
+
+
+class IntervalTree:
+    #Half-open [start, end) intervals with an id, a treap ordered by (start, end, id) where
+    #every node knows the latest end below it, so overlap searches skip whole subtrees
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, start, end, id: int):
+        left, right = split(self.root, (start, end, id))
+        self.root = merge(merge(left, Node((start, end, id), end)), right)
+        self.size += 1
+
+    def remove(self, start, end, id: int):
+        left, rest = split(self.root, (start, end, id))
+        removed, right = split(rest, (start, end, id + 1))
+        self.root = merge(left, right)
+        self.size -= removed is not None
+
+    def overlapping(self, start, end) -> list[tuple]:
+        #(start, end, id) of the intervals overlapping [start, end), by start
+        found = []
+        stack = []
+        node = self.root
+        while stack or node is not None:
+            #In order walk, a subtree is skipped when everything in it ends too early
+            if node is not None and node.max_end > start:
+                stack.append(node)
+                node = node.left
+                continue
+            if not stack:
+                break
+            node = stack.pop()
+            if node.key[0] >= end:
+                break
+            if node.end > start:
+                found.append(node.key)
+            node = node.right
+        return found
+
+    def __len__(self) -> int:
+        return self.size
+
+
+class Calendar:
+    #Intervals of the rows per key (e.g. member), registered on a table like an index.
+    #span(row) -> (start, end) as comparable times, end may be None.
+    def __init__(self, keys, span):
+        self._keys = keys
+        self._span = span
+        self.clear()
+
+    def add(self, row, position: int):
+        start, end = self._span(row)
+        end = max(end or start, start + MOMENT)
+        keys = set(self._keys(row))
+        self._entries[row.id] = (keys, start, end)
+        for key in keys:
+            if key not in self._trees:
+                self._trees[key] = IntervalTree()
+            self._trees[key].add(start, end, row.id)
+
+    def remove(self, id: int):
+        keys, start, end = self._entries.pop(id, ((), None, None))
+        for key in keys:
+            tree = self._trees[key]
+            tree.remove(start, end, id)
+            if not tree:
+                del self._trees[key]
+
+    def clear(self):
+        self._trees = {}
+        self._entries = {}
+
+    def between(self, key, start: datetime, end: datetime) -> list[int]:
+        #Ids of the rows of key overlapping [start, end), by start
+        tree = self._trees.get(key)
+        return [id for _, _, id in tree.overlapping(start, end)] if tree else []
+
+    def conflicts(self, keys, start: datetime, end: datetime | None, exclude: int | None = None) -> list[int]:
+        #Ids of the rows of any of keys overlapping [start, end), by start, without exclude
+        end = max(end or start, start + MOMENT)
+        found = set()
+        for key in set(keys):
+            tree = self._trees.get(key)
+            if tree:
+                found.update(entry for entry in tree.overlapping(start, end) if entry[2] != exclude)
+        return [id for _, _, id in sorted(found)]
+
+    def __len__(self) -> int:
+        return len(self._trees)
@@ -0,0 +1,240 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from itertools import compress, repeat
+from operator import and_, eq, not_
+
+from sortedcontainers import SortedDict
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def epoch_micros(value: datetime) -> int:
+    #Naive times count as UTC, same as as_utc
+    if not isinstance(value, datetime):
+        raise TypeError("expected a datetime")
+    return ((value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value) - EPOCH) // MICROSECOND
+
+
+class Ledger:
+    #Transactions as parallel typed arrays, one slot per row. A removed row's slot gets
+    #the last row, so the arrays stay dense. dtypes are stored as codes into names.
+    #Registered on the table like an index, it tells its views about every row it gets or drops.
+    def __init__(self):
+        self.names = []
+        self.codes = {}
+        self.views = []
+        self.clear()
+
+    def columns(self) -> tuple:
+        return self.ids, self.amounts, self.magnitudes, self.times, self.months, self.incomes, self.jars, self.dtypes
+
+    def add(self, row, position: int):
+        code = self.codes.get(row.dtype)
+        if code is None:
+            code = self.codes[row.dtype] = len(self.names)
+            self.names.append(row.dtype)
+        slot = self._slots[row.id] = len(self.ids)
+        self.ids.append(row.id)
+        self.amounts.append(row.amount)
+        self.magnitudes.append(abs(row.amount))
+        self.times.append(epoch_micros(row.datecreation))
+        #Calendar month of the stored time (not of UTC), the same as Rollup groups by
+        self.months.append(row.datecreation.year * 12 + row.datecreation.month - 1)
+        self.incomes.append(row.isIncome)
+        self.jars.append(-1 if row.jarId is None else row.jarId)
+        self.dtypes.append(code)
+        for view in self.views:
+            view.added(row, slot)
+
+    def remove(self, id: int):
+        slot = self._slots.pop(id, None)
+        if slot is None:
+            return
+        for view in self.views:
+            view.removing(slot)
+        last = len(self.ids) - 1
+        for column in self.columns():
+            column[slot] = column[last]
+            column.pop()
+        if slot != last:
+            self._slots[self.ids[slot]] = slot
+
+    def clear(self):
+        self.ids = array("q")
+        self.amounts = array("d")
+        self.magnitudes = array("d")
+        self.times = array("q")
+        self.months = array("l")
+        self.incomes = array("b")
+        self.jars = array("q")
+        self.dtypes = array("l")
+        self._slots = {}
+        for view in self.views:
+            view.reset()
+
+    def where(self, kind: str = "all", dtype: str | None = None) -> bytes | None:
+        #One selector byte per slot for itertools.compress, None when every row matches
+        if kind == "all":
+            selectors = None
+        elif kind == "income":
+            selectors = bytes(self.incomes)
+        elif kind == "outcome":
+            selectors = bytes(map(not_, self.incomes))
+        else:
+            return bytes(len(self.ids))
+        if dtype is None:
+            return selectors
+        code = self.codes.get(dtype)
+        matches = bytes(map(eq, self.dtypes, repeat(code))) if code is not None else bytes(len(self.ids))
+        return matches if selectors is None else bytes(map(and_, selectors, matches))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class LedgerIndex:
+    #Answers like an Index from a ledger. The rows of a key (chosen by select over the
+    #columns) are sorted by the ledger columns named in sort on the first lookup, with
+    #"ids" last so the order is the Index one. After that the ledger keeps them sorted.
+    def __init__(self, ledger: Ledger, keys, select, sort: tuple[str, ...], order):
+        self.ledger = ledger
+        self.keys = keys
+        self.select = select
+        self.sort = sort
+        self.order = order
+        self._sorted = {}
+        ledger.views.append(self)
+
+    #The table's calls, the ledger does the work
+    def add(self, row, position: int):
+        pass
+
+    def remove(self, id: int):
+        pass
+
+    def clear(self):
+        pass
+
+    def added(self, row, slot: int):
+        if not self._sorted:
+            return
+        entry = self._entry(slot)
+        for key in set(self.keys(row)):
+            columns = self._sorted.get(key)
+            if columns is not None:
+                at = bisect_left(range(len(columns[0])), entry, key=self._at(columns))
+                for column, value in zip(columns, entry):
+                    column.insert(at, value)
+
+    def removing(self, slot: int):
+        entry = self._entry(slot)
+        for columns in self._sorted.values():
+            at = bisect_left(range(len(columns[0])), entry, key=self._at(columns))
+            if at < len(columns[0]) and self._at(columns)(at) == entry:
+                for column in columns:
+                    del column[at]
+
+    def reset(self):
+        self._sorted = {}
+
+    def _entry(self, slot: int) -> tuple:
+        return tuple(getattr(self.ledger, name)[slot] for name in self.sort)
+
+    def _at(self, columns: list):
+        return lambda position: tuple(column[position] for column in columns)
+
+    def _columns(self, key) -> list:
+        #Sort columns of the key's rows in sorted order, by stable sorts from the last column to the first
+        columns = self._sorted.get(key)
+        if columns is None:
+            selectors = self.select(key)
+            slots = list(range(len(self.ledger)) if selectors is None else compress(range(len(self.ledger)), selectors))
+            for name in reversed(self.sort):
+                slots.sort(key=getattr(self.ledger, name).__getitem__)
+            columns = []
+            for name in self.sort:
+                column = getattr(self.ledger, name)
+                columns.append(array(column.typecode, map(column.__getitem__, slots)))
+            self._sorted[key] = columns
+        return columns
+
+    def ids(self, key, limit: int | None = None, after=None, reverse: bool = False) -> list[int]:
+        columns = self._columns(key)
+        start, stop = 0, len(columns[0])
+        if after is not None:
+            #Same bounds as Index: only rows strictly past after in reading direction
+            bound = tuple(epoch_micros(value) if isinstance(value, datetime) else value for value in after)
+            if reverse:
+                stop = bisect_left(range(stop), bound, key=self._at(columns))
+            else:
+                start = bisect_right(range(stop), bound, key=self._at(columns))
+        if limit is not None:
+            if reverse:
+                start = max(start, stop - limit)
+            else:
+                stop = min(stop, start + limit)
+        ids = columns[-1][start:stop].tolist()
+        return ids[::-1] if reverse else ids
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+
+class LedgerRollup:
+    #Answers like the month Rollup: [sum, count] per (year, month, dtype, isIncome). Grouped
+    #from the columns on the first read, then kept up to date as the ledger changes.
+    def __init__(self, ledger: Ledger):
+        self.ledger = ledger
+        self.totals = None
+        ledger.views.append(self)
+
+    def add(self, row, position: int):
+        pass
+
+    def remove(self, id: int):
+        pass
+
+    def clear(self):
+        pass
+
+    def added(self, row, slot: int):
+        if self.totals is not None:
+            total = self.totals.setdefault(self._key(slot), [0.0, 0])
+            total[0] += self.ledger.amounts[slot]
+            total[1] += 1
+
+    def removing(self, slot: int):
+        if self.totals is not None:
+            key = self._key(slot)
+            total = self.totals[key]
+            total[0] -= self.ledger.amounts[slot]
+            total[1] -= 1
+            if total[1] == 0:
+                del self.totals[key]
+
+    def reset(self):
+        self.totals = None
+
+    def _key(self, slot: int) -> tuple:
+        month = self.ledger.months[slot]
+        return month // 12, month % 12 + 1, self.ledger.names[self.ledger.dtypes[slot]], bool(self.ledger.incomes[slot])
+
+    def range(self, start=None, end=None):
+        if self.totals is None:
+            ledger = self.ledger
+            totals = {}
+            for key, amount in zip(zip(ledger.months, ledger.dtypes, ledger.incomes), ledger.amounts):
+                total = totals.get(key)
+                if total is None:
+                    total = totals[key] = [0.0, 0]
+                total[0] += amount
+                total[1] += 1
+            self.totals = SortedDict(((month // 12, month % 12 + 1, ledger.names[dtype], bool(income)), total)
+                                     for (month, dtype, income), total in totals.items())
+        for key in self.totals.irange(minimum=start, maximum=end, inclusive=(True, False)):
+            yield key, self.totals[key]
+
+    def __len__(self) -> int:
+        return 0 if self.totals is None else len(self.totals)
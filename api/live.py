@@ -0,0 +1,63 @@
+import asyncio
+
+
+class Subscriber:
+    #One open live connection, messages wait here until the connection sends them
+    def __init__(self, userId: int, size: int):
+        self.userId = userId
+        self.queue = asyncio.Queue(size)
+        self.dropped = 0
+
+    def put(self, message: bytes, resync: bytes):
+        #A consumer that can't keep up loses its backlog and only gets told to resync
+        if self.queue.full():
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(resync)
+        else:
+            self.queue.put_nowait(message)
+
+    async def get(self, timeout: float | None = None) -> bytes | None:
+        #None when nothing arrived in time, so the connection can send a keepalive
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Hub:
+    #Fans out change messages to every subscriber of this worker
+    def __init__(self, size: int = 32):
+        self.size = size
+        self.subscribers: set[Subscriber] = set()
+        self.watcher: asyncio.Task | None = None
+
+    def subscribe(self, userId: int) -> Subscriber:
+        subscriber = Subscriber(userId, self.size)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def watch(self, watcher):
+        #Keeps one watcher() task running while there are subscribers
+        if self.watcher is None or self.watcher.done():
+            self.watcher = asyncio.create_task(watcher())
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def publish(self, message_for, resync: bytes):
+        #message_for(userId) builds what that user may see (None = nothing), once per user
+        messages = {}
+        for subscriber in list(self.subscribers):
+            if subscriber.userId not in messages:
+                messages[subscriber.userId] = await message_for(subscriber.userId)
+            if messages[subscriber.userId] is not None:
+                subscriber.put(messages[subscriber.userId], resync)
+
+    def broadcast(self, message: bytes):
+        for subscriber in list(self.subscribers):
+            subscriber.put(message, message)
+
+    def __len__(self) -> int:
+        return len(self.subscribers)
@@ -1,7 +1,27 @@
-from pydantic import BaseModel
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import date, datetime
 
-class User(BaseModel):
+#Stored rows are plain slotted records without validation, requests are checked by
+#the pydantic models in models_request before anything ends up here.
+
+#Participant lists repeat a lot within a household, equal ones share one tuple. Only the
+#most recently used lists are kept, so lists nobody uses anymore don't pile up.
+id_tuple_limit = 4096
+_id_tuples: OrderedDict[tuple, tuple] = OrderedDict()
+
+def id_tuple(ids) -> tuple[int, ...]:
+    ids = tuple(ids)
+    if len(ids) > 8:
+        return ids
+    shared = _id_tuples.pop(ids, ids)
+    _id_tuples[ids] = shared
+    if len(_id_tuples) > id_tuple_limit:
+        _id_tuples.popitem(last=False)
+    return shared
+
+@dataclass(slots=True, kw_only=True)
+class User:
     id: int
     avatar_id: str
     name: str
@@ -12,9 +32,13 @@ class User(BaseModel):
     created_events: int = 0
     created_tasks: int = 0
     #Relational
-    has_achievement: list[int] = []
+    has_achievement: tuple[int, ...] = ()
 
-class Task(BaseModel):
+    def __post_init__(self):
+        self.has_achievement = tuple(self.has_achievement)
+
+@dataclass(slots=True, kw_only=True)
+class Task:
     id: int
     name: str
     description: str
@@ -23,22 +47,30 @@ class Task(BaseModel):
     priority: int #1-2-3 easy-medium-hard
     repeatable: bool
     repeatabletype: int #1-2-3 daily-weekly-monthly
-    participating: list[int]
+    participating: tuple[int, ...]
     done:bool
     #Relational
     created_by:int
 
-class Event(BaseModel):
+    def __post_init__(self):
+        self.participating = id_tuple(self.participating)
+
+@dataclass(slots=True, kw_only=True)
+class Event:
     id: int
     name: str
     starttime: datetime
     endtime: datetime | None
     description: str
-    participating: list[int]
+    participating: tuple[int, ...]
     #Relational
     created_by: int
-    
-class Transaction(BaseModel):
+
+    def __post_init__(self):
+        self.participating = id_tuple(self.participating)
+
+@dataclass(slots=True, kw_only=True)
+class Transaction:
     id:int
     amount: float
     datecreation: datetime
@@ -46,21 +78,29 @@ class Transaction(BaseModel):
     jarId: int | None = None
     dtype: str
 
-class Jar(BaseModel):
+    def __post_init__(self):
+        self.amount = float(self.amount)
+
+@dataclass(slots=True, kw_only=True)
+class Jar:
     id:int
     target:str
     totalamount:float
     currentamount:float
     deadline: date
-    #Relational
-    has_transactions: list[int]
 
-class Achievement(BaseModel):
+    def __post_init__(self):
+        self.totalamount = float(self.totalamount)
+        self.currentamount = float(self.currentamount)
+
+@dataclass(slots=True, kw_only=True)
+class Achievement:
     id: int
     name: str
     description: str
 
-class Type(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class Type:
     id: int
     name: str
     #Relational
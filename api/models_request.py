@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import Literal
+from pydantic import BaseModel, field_validator
 from datetime import date, datetime
 
 class UserRequest(BaseModel):
@@ -30,6 +31,27 @@ class TransactionRequest(BaseModel):
     jarId: int | None = None
     dtype: str
 
+class TransactionImportRequest(TransactionRequest):
+    #One imported row, now when datecreation is missing
+    datecreation: datetime | None = None
+
+    @field_validator("jarId", "datecreation", mode="before")
+    @classmethod
+    def blank_is_none(cls, value):
+        return None if value == "" else value
+
+    @field_validator("datecreation", mode="before")
+    @classmethod
+    def exported_date(cls, value):
+        #Accepts the dd.mm.YYYY HH:MM the API shows as well as ISO, sliced since strptime
+        #is slow enough to show up in big imports
+        if isinstance(value, str) and len(value) == 16 and value[2] == value[5] == "." and value[10] == " " and value[13] == ":":
+            try:
+                return datetime(int(value[6:10]), int(value[3:5]), int(value[:2]), int(value[11:13]), int(value[14:]))
+            except ValueError:
+                pass
+        return value
+
 class JarRequest(BaseModel):
     target: str
     totalamount: float
@@ -48,3 +70,15 @@ class TypeRequest(BaseModel):
 
 class BudgetRequest(BaseModel):
     amount: float
+
+class BatchOperation(BaseModel):
+    op: Literal["task.add", "task.update", "task.done", "task.delete", "event.add", "event.update", "event.delete",
+                "transaction.add", "transaction.delete"]
+    #Row to change (update, done, delete), acting user (task/event add, task done)
+    id: int | None = None
+    userId: int | None = None
+    #Body of add/update, same fields as the single endpoint takes
+    data: dict | None = None
+
+class BatchRequest(BaseModel):
+    operations: list[BatchOperation]
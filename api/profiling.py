@@ -0,0 +1,87 @@
+import cProfile
+import hmac
+import io
+import itertools
+import pstats
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+
+class Profiler:
+    #Keeps the reports of the last profiled requests, the oldest fall off first
+    def __init__(self, token: str, size: int = 20, lines: int = 40):
+        self.token = token
+        self.lines = lines
+        self.reports = deque(maxlen=size)
+        self.busy = False
+        self._ids = itertools.count(1)
+
+    def allowed(self, token: str | None) -> bool:
+        return token is not None and hmac.compare_digest(token.encode(), self.token.encode())
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def save(self, report: dict):
+        self.reports.append(report)
+
+    def get(self, id: int) -> dict | None:
+        return next((report for report in self.reports if report["id"] == id), None)
+
+
+def without_token(query: str) -> str:
+    return "&".join(pair for pair in query.split("&") if pair and not pair.startswith("profile="))
+
+def requested_token(scope) -> str | None:
+    #X-Profile header or ?profile= query flag
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.decode("latin-1")
+    for pair in scope["query_string"].decode("latin-1").split("&"):
+        name, _, value = pair.partition("=")
+        if name == "profile":
+            return value
+    return None
+
+
+class ProfileMiddleware:
+    #Runs a request under cProfile when it carries the profiling token. The profiler
+    #sees the whole thread, so other requests running at the same time show up too.
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["path"].startswith("/debug/") or self.profiler.busy
+                or not self.profiler.allowed(requested_token(scope))):
+            return await self.app(scope, receive, send)
+        id = self.profiler.next_id()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", str(id).encode())]
+            await send(message)
+
+        self.profiler.busy = True
+        profile = cProfile.Profile()
+        started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.disable()
+            self.profiler.busy = False
+            duration = time.perf_counter() - started
+            output = io.StringIO()
+            pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(self.profiler.lines)
+            self.profiler.save({
+                "id": id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": without_token(scope["query_string"].decode("latin-1")),
+                "started": started_at,
+                "duration_ms": round(duration * 1000, 2),
+                "report": output.getvalue(),
+            })
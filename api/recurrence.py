@@ -0,0 +1,134 @@
+import calendar
+from datetime import date, datetime, time, timedelta, timezone
+
+from sortedcontainers import SortedList
+
+#Task.repeatabletype values
+DAILY, WEEKLY, MONTHLY = 1, 2, 3
+
+
+def add_months(moment: datetime, months: int) -> datetime:
+    #Same day of the month, or the month's last day when that month is shorter
+    year, month = divmod(moment.month - 1 + months, 12)
+    year += moment.year
+    return moment.replace(year=year, month=month + 1, day=min(moment.day, calendar.monthrange(year, month + 1)[1]))
+
+
+class Rule:
+    #Occurrences of a repeating task, occurrence n is computed from the first one when asked for
+    def __init__(self, kind: int, first: datetime):
+        self.kind = kind
+        self.first = first
+
+    def at(self, n: int) -> datetime:
+        if self.kind == MONTHLY:
+            return add_months(self.first, n)
+        return self.first + timedelta(days=n if self.kind == DAILY else 7 * n)
+
+    def next_after(self, moment: datetime) -> datetime:
+        #First occurrence later than moment, naive times count as UTC
+        if self.first.tzinfo is None and moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        elif self.first.tzinfo is not None and moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        if moment < self.first:
+            return self.first
+        if self.kind == MONTHLY:
+            n = max(0, (moment.year - self.first.year) * 12 + moment.month - self.first.month - 1)
+        else:
+            n = (moment - self.first) // timedelta(days=1 if self.kind == DAILY else 7)
+        while self.at(n) <= moment:
+            n += 1
+        return self.at(n)
+
+
+def task_rule(task) -> Rule | None:
+    if task.repeatable and task.repeatabletype in (DAILY, WEEKLY, MONTHLY):
+        return Rule(task.repeatabletype, task.deadline)
+    return None
+
+
+class Buckets:
+    #Open tasks of one key. One-off deadlines are sorted by time, series by time of day
+    #under the days they fall on: every day, a weekday, or a day of the month.
+    def __init__(self):
+        self.once = SortedList()
+        self.daily = SortedList()
+        self.weekly = [SortedList() for _ in range(7)]
+        self.monthly = [SortedList() for _ in range(31)]
+
+    def bucket(self, kind: int | None, first: datetime) -> SortedList:
+        if kind is None:
+            return self.once
+        if kind == DAILY:
+            return self.daily
+        if kind == WEEKLY:
+            return self.weekly[first.weekday()]
+        return self.monthly[first.day - 1]
+
+    def day(self, day: date, start: time, end: time | None) -> list[tuple[datetime, int]]:
+        #(occurrence, id) on day with start <= time of day < end, None = until midnight
+        found = [entry for entry in self.once.irange((datetime.combine(day, start),),
+                                                     (datetime.combine(day, end),) if end is not None else (datetime.combine(day + timedelta(days=1), time()),),
+                                                     inclusive=(True, False))]
+        series = [self.daily, self.weekly[day.weekday()], self.monthly[day.day - 1]]
+        last = calendar.monthrange(day.year, day.month)[1]
+        if day.day == last:
+            #Series on the 29th to 31st fall on the last day of shorter months
+            series.extend(self.monthly[last:])
+        for bucket in series:
+            for time_of_day, first, id in bucket.irange((start,), (end,) if end is not None else None, inclusive=(True, False)):
+                moment = datetime.combine(day, time_of_day)
+                if first <= moment:
+                    found.append((moment, id))
+        found.sort()
+        return found
+
+    def __bool__(self) -> bool:
+        return bool(self.once or self.daily or any(self.weekly) or any(self.monthly))
+
+
+class Schedule:
+    #Occurrences of the open tasks per key (e.g. member), registered on the tasks table like an
+    #index. A range query walks the days of the range and only touches tasks due on them.
+    #Times are wall clock times, the same ones the task list shows.
+    def __init__(self, keys):
+        self._keys = keys
+        self.clear()
+
+    def add(self, row, position: int):
+        rule = task_rule(row)
+        kind = rule.kind if rule else None
+        first = row.deadline.replace(tzinfo=None)
+        entry = (first, row.id) if kind is None else (first.time(), first, row.id)
+        keys = set(self._keys(row))
+        self._entries[row.id] = (keys, kind, first, entry)
+        for key in keys:
+            if key not in self._buckets:
+                self._buckets[key] = Buckets()
+            self._buckets[key].bucket(kind, first).add(entry)
+
+    def remove(self, id: int):
+        keys, kind, first, entry = self._entries.pop(id, ((), None, None, None))
+        for key in keys:
+            buckets = self._buckets[key]
+            buckets.bucket(kind, first).remove(entry)
+            if not buckets:
+                del self._buckets[key]
+
+    def clear(self):
+        self._buckets = {}
+        self._entries = {}
+
+    def between(self, key, start: datetime, end: datetime, limit: int | None = None) -> list[tuple[datetime, int]]:
+        #(occurrence, id) with start <= occurrence < end in time order, at most limit of them
+        buckets = self._buckets.get(key)
+        found = []
+        day = start.date()
+        while buckets and day <= end.date() and (limit is None or len(found) < limit):
+            found.extend(buckets.day(day, start.time() if day == start.date() else time(), end.time() if day == end.date() else None))
+            day += timedelta(days=1)
+        return found[:limit]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from collections import deque
+
+from sortedcontainers import SortedList
+
+
+class Timers:
+    #Pending (time, key) pairs in time order, at most one per key
+    def __init__(self):
+        self._order = SortedList()
+        self._times = {}
+
+    def schedule(self, key, when: float) -> bool:
+        #True when the timer is the next one due now
+        self.cancel(key)
+        self._times[key] = when
+        self._order.add((when, key))
+        return self._order[0][1] == key
+
+    def cancel(self, key):
+        when = self._times.pop(key, None)
+        if when is not None:
+            self._order.remove((when, key))
+
+    def next(self) -> float | None:
+        return self._order[0][0] if self._order else None
+
+    def pop_due(self, now: float) -> list:
+        due = []
+        while self._order and self._order[0][0] <= now:
+            when, key = self._order.pop(0)
+            del self._times[key]
+            due.append(key)
+        return due
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+
+class MemorySink:
+    #Keeps the last notifications, for tests and for running without a real delivery
+    def __init__(self, size: int = 1_000):
+        self.notifications = deque(maxlen=size)
+
+    async def deliver(self, notification: dict):
+        self.notifications.append(notification)
+
+
+class Reminders:
+    #One asyncio task per worker fires the timers of every family in time order and hands
+    #the notifications to sink.deliver(). Times are epoch seconds.
+    def __init__(self, sink):
+        self.sink = sink
+        self.timers = Timers()
+        self.indexes = {}
+        self.clock = time.time
+        self._wake = None
+        self._task = None
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wake = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    def schedule(self, key, when: float):
+        if self.timers.schedule(key, when) and self._wake is not None:
+            self._wake.set()
+
+    def cancel(self, key):
+        self.timers.cancel(key)
+
+    async def fire_due(self) -> int:
+        due = self.timers.pop_due(self.clock())
+        for key in due:
+            notification = self.indexes[key[:2]].notification(key)
+            if notification is not None:
+                await self.sink.deliver(notification)
+        return len(due)
+
+    async def _run(self):
+        while True:
+            await self.fire_due()
+            next = self.timers.next()
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), None if next is None else max(0.0, next - self.clock()))
+            except asyncio.TimeoutError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+
+class ReminderIndex:
+    #Timers of one table of one family, registered on the table like an index so that
+    #updates reschedule them and deletes cancel them. timers(row) -> [(kind, aware datetime)],
+    #only future ones are kept. members(row) are the users a notification is for.
+    def __init__(self, reminders: Reminders, family: int, table, timers, members):
+        self.reminders = reminders
+        self.prefix = (family, table.name)
+        self.table = table
+        self.timers = timers
+        self.members = members
+        self._pending = {}
+        reminders.indexes[self.prefix] = self
+
+    def add(self, row, position: int):
+        now = self.reminders.clock()
+        kinds = []
+        for kind, when in self.timers(row):
+            if when.timestamp() > now:
+                self.reminders.schedule((*self.prefix, row.id, kind), when.timestamp())
+                kinds.append(kind)
+        if kinds:
+            self._pending[row.id] = kinds
+
+    def remove(self, id: int):
+        for kind in self._pending.pop(id, ()):
+            self.reminders.cancel((*self.prefix, id, kind))
+
+    def clear(self):
+        for id in list(self._pending):
+            self.remove(id)
+
+    def notification(self, key) -> dict | None:
+        family, collection, id, kind = key
+        kinds = self._pending.get(id, [])
+        if kind in kinds:
+            kinds.remove(kind)
+            if not kinds:
+                del self._pending[id]
+        row = self.table.get(id)
+        due = dict(self.timers(row)).get(kind) if row is not None else None
+        if due is None:
+            return None
+        return {"family": family, "collection": collection, "id": id, "kind": kind, "due": due.isoformat(), "users": self.members(row)}
+
+    def __len__(self) -> int:
+        return len(self._pending)
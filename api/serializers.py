@@ -0,0 +1,159 @@
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse, Response
+from database import current, family_local
+from models_database import Event, Jar, Task, Transaction, User
+from store import Derived
+
+
+class RowCache:
+    #Encoded json per row, registered on a table like an index so that every
+    #add, update or remove of the row throws its entry away
+    def __init__(self):
+        self.clear()
+
+    def add(self, row, position: int):
+        self._encoded.pop(row.id, None)
+
+    def remove(self, id: int):
+        self._encoded.pop(id, None)
+
+    def clear(self):
+        self._encoded = {}
+
+    def get(self, row, format, extra=None) -> orjson.Fragment:
+        #extra is anything else the output depends on, e.g. the creator's name
+        cached = self._encoded.get(row.id)
+        if cached is None or cached[0] != extra:
+            cached = (extra, orjson.Fragment(orjson.dumps(format(row))))
+            self._encoded[row.id] = cached
+        return cached[1]
+
+    def __len__(self) -> int:
+        return len(self._encoded)
+
+
+def row_cache(table) -> RowCache:
+    if "json" not in table.indexes:
+        table.add_index("json", RowCache())
+    return table.indexes["json"]
+
+
+#*------------*USERS*------------*
+def summarize_user(user: User) -> dict:
+    return {
+        "id": user.id,
+        "avatar_id": user.avatar_id,
+        "name": user.name,
+        "surname": user.surname,
+        "role": user.role,
+    }
+
+user_summaries = family_local(lambda family: Derived(family.users, lambda rows: {user.id: summarize_user(user) for user in rows}))
+
+def user_name(userId: int) -> str:
+    summary = user_summaries.get().get(userId)
+    return summary["name"] if summary else "Unknown"
+
+def embedded_users(rows) -> dict:
+    #Every creator and participant of rows once, so clients don't need /users_all per item
+    summaries = user_summaries.get()
+    userIds = {userId for row in rows for userId in (row.created_by, *row.participating)}
+    return {userId: summaries[userId] for userId in sorted(userIds) if userId in summaries}
+
+
+#*------------*ROWS*------------*
+def format_user(user: User) -> dict:
+    return {
+        "id": user.id,
+        "avatar_id": user.avatar_id,
+        "name": user.name,
+        "surname": user.surname,
+        "role": user.role,
+        "dob": user.dob.strftime("%d.%m.%Y"),
+        "done_tasks": user.done_tasks,
+        "created_events": user.created_events,
+        "created_tasks": user.created_tasks,
+        "has_achievement": user.has_achievement,
+    }
+
+def format_task(task: Task) -> dict:
+    return {
+        "id": task.id,
+        "name": task.name,
+        "description": task.description,
+        "datecreation": task.datecreation.strftime("%d.%m.%Y"),
+        "deadline": task.deadline.strftime("%d.%m.%Y %H:%M"),
+        "priority": task.priority,
+        "repeatable": task.repeatable,
+        "repeatabletype": task.repeatabletype,
+        "participating": task.participating,
+        "done": task.done,
+        "created_by": task.created_by,
+        "from": user_name(task.created_by)
+    }
+
+def format_event(event: Event) -> dict:
+    return {
+        "id": event.id,
+        "name": event.name,
+        "starttime": event.starttime.strftime("%d.%m.%Y %H:%M"),
+        "endtime": event.endtime.strftime("%d.%m.%Y %H:%M") if event.endtime else None,
+        "description": event.description,
+        "participating": event.participating,
+        "created_by": event.created_by,
+        "from": user_name(event.created_by)
+    }
+
+def format_transaction(transaction: Transaction) -> dict:
+    return {
+        "id": transaction.id,
+        "amount": transaction.amount,
+        "datecreation": transaction.datecreation.strftime("%d.%m.%Y %H:%M"),
+        "isIncome": transaction.isIncome,
+        "jarId": transaction.jarId,
+        "dtype": transaction.dtype,
+    }
+
+def jar_transactions(jar: Jar) -> list[int]:
+    #From the jar index, deleting a transaction doesn't have to search a stored list
+    return current().transactions.indexes["jar"].ids(jar.id)
+
+def jar_row(jar: Jar) -> dict:
+    #What the jar write endpoints return, the stored fields as they are (ISO deadline)
+    return {**jsonable_encoder(jar), "has_transactions": jar_transactions(jar)}
+
+def format_jar(jar: Jar) -> dict:
+    return {
+        "id": jar.id,
+        "target": jar.target,
+        "totalamount": jar.totalamount,
+        "currentamount": jar.currentamount,
+        "deadline": jar.deadline.strftime("%d.%m.%Y") if jar.deadline else None,
+        "has_transactions": jar_transactions(jar),
+    }
+
+
+#Same output as the format_* functions, encoded once per row version
+def encode_task(task: Task) -> orjson.Fragment:
+    return row_cache(current().tasks).get(task, format_task, user_name(task.created_by))
+
+def encode_event(event: Event) -> orjson.Fragment:
+    return row_cache(current().events).get(event, format_event, user_name(event.created_by))
+
+def encode_transaction(transaction: Transaction) -> orjson.Fragment:
+    return row_cache(current().transactions).get(transaction, format_transaction)
+
+def encode_jar(jar: Jar) -> orjson.Fragment:
+    return row_cache(current().jars).get(jar, format_jar)
+
+
+def json_response(content) -> Response:
+    #Skips jsonable_encoder, content may hold Fragments from the encode_* functions
+    return ORJSONResponse(content)
+
+def embed(value):
+    #Handler result (maybe an already encoded response) as a part of a bigger response
+    if isinstance(value, Response):
+        return orjson.Fragment(value.body)
+    return jsonable_encoder(value)
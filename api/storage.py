@@ -0,0 +1,211 @@
+import os
+import sqlite3
+import threading
+from dataclasses import fields
+from datetime import date, datetime
+
+import orjson
+
+#Extra columns pulled out of the stored json so they can be indexed
+COLUMNS: dict[str, tuple[str, ...]] = {
+    "users": (),
+    "tasks": ("created_by",),
+    "events": ("created_by",),
+    "transactions": ("datecreation", "jarId"),
+    "jars": (),
+    "dtypes": ("relate",),
+}
+
+
+class MemoryStorage:
+    #Default backend: rows live in the in-memory tables only, single values here.
+    #Increments return None when there is no stored copy to update.
+    initialized = False
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def mark_initialized(self):
+        pass
+
+    def load(self, table: str, model) -> list:
+        return []
+
+    def save(self, table: str, row):
+        pass
+
+    def delete(self, table: str, id: int):
+        pass
+
+    def load_values(self) -> dict:
+        return dict(self._values)
+
+    def save_value(self, key: str, value):
+        self._values[key] = value
+
+    def reserve(self, key: str, count: int) -> int:
+        with self._lock:
+            start = self._values[key]
+            self._values[key] = start + count
+        return start
+
+    def increment(self, key: str, delta):
+        return None
+
+    def increment_field(self, table: str, id: int, field: str, delta):
+        return None
+
+    def changed(self) -> bool:
+        return False
+
+    def begin(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self) -> bool:
+        #Nothing is kept apart from the tables, so there is nothing to go back to
+        return False
+
+
+class SQLiteStorage:
+    #Write-through copy of the tables in one SQLite file (WAL mode), so data survives
+    #restarts and several worker processes can share it.
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._upserts = {table: _upsert_sql(table, columns) for table, columns in COLUMNS.items()}
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value NOT NULL)")
+            for table, columns in COLUMNS.items():
+                extra = "".join(f", {column}" for column in columns)
+                #rowid keeps insertion order, the unique id gets its own index
+                connection.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER NOT NULL UNIQUE{extra}, data TEXT NOT NULL)")
+                for column in columns:
+                    connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})")
+        self.initialized = self._connection().execute("SELECT 1 FROM meta WHERE key = 'initialized'").fetchone() is not None
+        self.changed()
+
+    def _connection(self) -> sqlite3.Connection:
+        #One connection per worker thread, reused by every request it serves
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, cached_statements=256)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._local.connection = connection
+            self._local.data_version = None
+        return connection
+
+    def load(self, table: str, model) -> list:
+        rows = self._connection().execute(f"SELECT data FROM {table} ORDER BY rowid")
+        decode = _decoder(model)
+        return [decode(data) for (data,) in rows]
+
+    def save(self, table: str, row):
+        values = [row.id, *(_column_value(getattr(row, column)) for column in COLUMNS[table]), orjson.dumps(row).decode()]
+        self._connection().execute(self._upserts[table], values)
+
+    def delete(self, table: str, id: int):
+        self._connection().execute(f"DELETE FROM {table} WHERE id = ?", (id,))
+
+    def load_values(self) -> dict:
+        return dict(self._connection().execute("SELECT key, value FROM meta WHERE key != 'initialized'"))
+
+    def save_value(self, key: str, value):
+        self._connection().execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def reserve(self, key: str, count: int) -> int:
+        #Returns the first of count ids nobody else will get, whichever worker asks next
+        (end,) = self._connection().execute(
+            "UPDATE meta SET value = value + ? WHERE key = ? RETURNING value", (count, key)
+        ).fetchone()
+        return end - count
+
+    def increment(self, key: str, delta):
+        (value,) = self._connection().execute(
+            "UPDATE meta SET value = value + ? WHERE key = ? RETURNING value", (delta, key)
+        ).fetchone()
+        return value
+
+    def increment_field(self, table: str, id: int, field: str, delta):
+        path = f"$.{field}"
+        (value,) = self._connection().execute(
+            f"UPDATE {table} SET data = json_set(data, ?, json_extract(data, ?) + ?) WHERE id = ? RETURNING json_extract(data, ?)",
+            (path, path, delta, id, path),
+        ).fetchone()
+        return value
+
+    def mark_initialized(self):
+        self.save_value("initialized", True)
+        self.commit()
+        self.initialized = True
+
+    def changed(self) -> bool:
+        #data_version only moves when another connection (another worker) commits.
+        #It is per connection, so a new connection has nothing to compare with yet.
+        version = self._connection().execute("PRAGMA data_version").fetchone()[0]
+        changed = version != self._local.data_version
+        self._local.data_version = version
+        return changed
+
+    def begin(self):
+        #Takes the database write lock up front, so reads done afterwards stay current
+        #until commit and other workers queue behind us (busy_timeout)
+        self._connection().execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        self._connection().commit()
+
+    def rollback(self) -> bool:
+        self._connection().rollback()
+        return True
+
+
+def _upsert_sql(table: str, columns: tuple[str, ...]) -> str:
+    names = "".join(f", {column}" for column in columns)
+    updates = "".join(f", {column} = excluded.{column}" for column in columns)
+    return (f"INSERT INTO {table} (id{names}, data) VALUES (?{', ?' * len(columns)}, ?) "
+            f"ON CONFLICT(id) DO UPDATE SET data = excluded.data{updates}")
+
+
+def _column_value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+_parsers = {date: date.fromisoformat, datetime: datetime.fromisoformat, datetime | None: lambda value: value and datetime.fromisoformat(value)}
+
+def _decoder(model):
+    #Stored json back into a row, dates are ISO strings. Keys the model doesn't know are skipped.
+    parsers = {field.name: _parsers.get(field.type) for field in fields(model)}
+
+    def decode(data: str):
+        values = orjson.loads(data)
+        return model(**{name: parse(values[name]) if parse else values[name] for name, parse in parsers.items() if name in values})
+    return decode
+
+
+def _sqlite_path(url: str, family: int) -> str:
+    #Every family has its own store: sqlite:family.db keeps family 1, family-2.db family 2 and so on
+    path = url.removeprefix("sqlite:")
+    if family != 1:
+        base, extension = os.path.splitext(path)
+        path = f"{base}-{family}{extension}"
+    return path
+
+def open_storage(url: str, family: int = 1):
+    if url == "memory":
+        return MemoryStorage()
+    if url.startswith("sqlite:"):
+        return SQLiteStorage(_sqlite_path(url, family))
+    raise ValueError(f"Unknown storage: {url}")
+
+def storage_exists(url: str, family: int) -> bool:
+    #In-memory stores only exist while their family is loaded
+    return url.startswith("sqlite:") and os.path.exists(_sqlite_path(url, family))
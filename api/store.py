@@ -0,0 +1,310 @@
+import math
+import threading
+from collections import deque
+from itertools import islice
+
+from sortedcontainers import SortedDict, SortedList
+
+
+class Index:
+    #key -> ids of the rows having that key, e.g. user id -> tasks of that user.
+    #Every bucket stays sorted by order(row), ties keep the table insertion order.
+    def __init__(self, keys, order=None):
+        self._keys = keys
+        self.order = order or (lambda row: ())
+        self._ids = {}
+        self._row_entries = {}
+
+    def add(self, row, position: int):
+        keys = set(self._keys(row))
+        entry = (self.order(row), position, row.id)
+        self._row_entries[row.id] = (keys, entry)
+        for key in keys:
+            if key not in self._ids:
+                self._ids[key] = SortedList()
+            self._ids[key].add(entry)
+
+    def remove(self, id: int):
+        keys, entry = self._row_entries.pop(id, ((), None))
+        for key in keys:
+            bucket = self._ids[key]
+            bucket.remove(entry)
+            if not bucket:
+                del self._ids[key]
+
+    def clear(self):
+        self._ids = {}
+        self._row_entries = {}
+
+    def ids(self, key, limit: int | None = None, after=None, reverse: bool = False) -> list[int]:
+        #after is an order value, only rows strictly past it in reading direction come back
+        bucket = self._ids.get(key)
+        if bucket is None:
+            return []
+        if after is None:
+            entries = reversed(bucket) if reverse else iter(bucket)
+        elif reverse:
+            entries = bucket.irange(maximum=(after,), reverse=True)
+        else:
+            entries = bucket.irange(minimum=(after, math.inf), inclusive=(False, True))
+        return [entry[-1] for entry in islice(entries, limit)]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+class Rollup:
+    #Running [sum, count] of value(row) per key(row), maintained by the table like an index
+    def __init__(self, key, value):
+        self._key = key
+        self._value = value
+        self.clear()
+
+    def add(self, row, position: int):
+        key, value = self._key(row), self._value(row)
+        self._row_parts[row.id] = (key, value)
+        total = self.totals.setdefault(key, [0.0, 0])
+        total[0] += value
+        total[1] += 1
+
+    def remove(self, id: int):
+        parts = self._row_parts.pop(id, None)
+        if parts is None:
+            return
+        key, value = parts
+        total = self.totals[key]
+        total[0] -= value
+        total[1] -= 1
+        if total[1] == 0:
+            del self.totals[key]
+
+    def clear(self):
+        self.totals = SortedDict()
+        self._row_parts = {}
+
+    def range(self, start=None, end=None):
+        #(key, [sum, count]) for start <= key < end, keys compare as tuples so a prefix works as a bound
+        for key in self.totals.irange(minimum=start, maximum=end, inclusive=(True, False)):
+            yield key, self.totals[key]
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+
+class ChangeLog:
+    #Sequence numbered (collection, key) of the latest changes, the oldest fall off first.
+    #Only what changed is kept, the current rows are read back from the tables.
+    def __init__(self, size: int = 10_000):
+        self.seq = 0
+        self.floor = 0
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, collection: str, key):
+        with self._lock:
+            if len(self._entries) == self._entries.maxlen:
+                self.floor = self._entries[0][0]
+            self.seq += 1
+            self._entries.append((self.seq, collection, key))
+
+    def compact(self):
+        #Drop everything, e.g. after a reload that doesn't say which rows changed. The seq
+        #moves on as well, so every cursor handed out before is too old and gets a snapshot.
+        with self._lock:
+            self._entries.clear()
+            self.seq += 1
+            self.floor = self.seq
+
+    def since(self, seq: int) -> tuple[int, dict | None]:
+        #Current seq and collection -> keys changed after seq, None when that part is gone
+        with self._lock:
+            if not self.floor <= seq <= self.seq:
+                return self.seq, None
+            changed = {}
+            for entry_seq, collection, key in reversed(self._entries):
+                if entry_seq <= seq:
+                    break
+                changed.setdefault(collection, set()).add(key)
+            return self.seq, changed
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Table:
+    #id -> row, dict keeps insertion order so listings look like the old lists
+    def __init__(self, rows=(), indexes: dict[str, Index] | None = None, name: str | None = None, storage=None,
+                 changes: ChangeLog | None = None):
+        self.name = name
+        self.storage = storage
+        self.changes = changes
+        self.indexes = indexes or {}
+        self._lock = threading.Lock()
+        self.reset(rows)
+
+    def reset(self, rows):
+        #Refill from scratch without writing to storage, e.g. after another worker committed
+        self.version = getattr(self, "version", 0) + 1
+        self._rows = {}
+        self._position = {}
+        self._next_position = 0
+        for index in self.indexes.values():
+            index.clear()
+        for row in rows:
+            self._put(row)
+        if self.changes is not None:
+            self.changes.compact()
+
+    def add_index(self, name: str, index):
+        self.indexes[name] = index
+        for id, row in self._rows.items():
+            index.add(row, self._position[id])
+
+    def get(self, id: int):
+        return self._rows.get(id)
+
+    def add(self, row):
+        self._put(row)
+        self._changed(row.id)
+        if self.storage:
+            self.storage.save(self.name, row)
+        return row
+
+    def update(self, row):
+        #Rows are edited in place, so indexes and storage have to be told afterwards
+        self._unindex(row.id)
+        self._index(row)
+        self._changed(row.id)
+        if self.storage:
+            self.storage.save(self.name, row)
+        return row
+
+    def increment(self, row, field: str, delta) -> int:
+        #Atomic counter update, the stored copy decides the value when there is one
+        with self._lock:
+            value = getattr(row, field) + delta
+            stored = self.storage.increment_field(self.name, row.id, field, delta) if self.storage else None
+            setattr(row, field, value if stored is None else stored)
+            self._changed(row.id)
+        return getattr(row, field)
+
+    def remove(self, id: int):
+        row = self._rows.pop(id, None)
+        if row is not None:
+            self._unindex(id)
+            del self._position[id]
+            self._changed(id)
+            if self.storage:
+                self.storage.delete(self.name, id)
+        return row
+
+    def lookup(self, index: str, key, limit: int | None = None, after=None, reverse: bool = False) -> list:
+        return [self._rows[id] for id in self.indexes[index].ids(key, limit, after, reverse)]
+
+    def all(self) -> list:
+        return list(self._rows.values())
+
+    def _changed(self, id: int):
+        self.version += 1
+        if self.changes is not None:
+            self.changes.record(self.name, id)
+
+    def _put(self, row):
+        if row.id in self._rows:
+            self._unindex(row.id)
+        else:
+            self._position[row.id] = self._next_position
+            self._next_position += 1
+        self._rows[row.id] = row
+        self._index(row)
+
+    def _index(self, row):
+        for index in self.indexes.values():
+            index.add(row, self._position[row.id])
+
+    def _unindex(self, id: int):
+        for index in self.indexes.values():
+            index.remove(id)
+
+    def __contains__(self, id: int) -> bool:
+        return id in self._rows
+
+    def __iter__(self):
+        return iter(self._rows.values())
+
+    def __reversed__(self):
+        return reversed(self._rows.values())
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class Derived:
+    #Value computed from a table, rebuilt only after the table changed
+    def __init__(self, table: Table, build):
+        self.table = table
+        self.build = build
+        self._version = None
+        self._value = None
+
+    def get(self):
+        if self._version != self.table.version:
+            self._value = self.build(self.table)
+            self._version = self.table.version
+        return self._value
+
+
+class Values:
+    #Single values next to the tables, e.g. the budget and the id counters
+    def __init__(self, defaults: dict, storage=None, name: str = "state", changes: ChangeLog | None = None):
+        self.storage = storage
+        self.name = name
+        self.changes = changes
+        self._lock = threading.Lock()
+        self.reset(defaults)
+
+    def reset(self, values: dict):
+        self.version = getattr(self, "version", 0) + 1
+        self._values = dict(values)
+        if self.changes is not None:
+            self.changes.compact()
+
+    def __getitem__(self, key: str):
+        return self._values[key]
+
+    def __setitem__(self, key: str, value):
+        self._values[key] = value
+        self._changed(key)
+        if self.storage:
+            self.storage.save_value(key, value)
+
+    def increment(self, key: str, delta):
+        with self._lock:
+            value = self._values[key] + delta
+            stored = self.storage.increment(key, delta) if self.storage else None
+            self._values[key] = value if stored is None else stored
+            self._changed(key)
+        return self._values[key]
+
+    def _changed(self, key: str):
+        self.version += 1
+        if self.changes is not None:
+            self.changes.record(self.name, key)
+
+
+class IdAllocator:
+    #Hands out ids from blocks reserved in storage, so workers never pick the same id
+    def __init__(self, storage, block: int = 64):
+        self.storage = storage
+        self.block = block
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def next(self, key: str) -> int:
+        with self._lock:
+            next_id, end = self._blocks.get(key, (0, 0))
+            if next_id >= end:
+                next_id = self.storage.reserve(key, self.block)
+                end = next_id + self.block
+            self._blocks[key] = (next_id + 1, end)
+        return next_id
@@ -0,0 +1,16 @@
+#Run from the api directory: python -m pytest -q tests
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from benchmarks.asgi import request
+
+
+def call(method: str, url: str, body=None, family: int = 1) -> tuple[int, object]:
+    #(status, decoded json) of one request to the app
+    status, content = asyncio.run(request(app, method, url, body, {"X-Family-Id": str(family)}))
+    return status, json.loads(content) if content else None
@@ -0,0 +1,29 @@
+import pytest
+
+from conftest import call
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_tasks_limit_below_one_is_rejected(limit):
+    status, body = call("GET", f"/tasks/1?limit={limit}")
+    assert status == 400
+    assert body["detail"]["error"] == "InvalidLimit"
+
+
+def test_tasks_limit():
+    status, body = call("GET", "/tasks/1?limit=2")
+    assert status == 200
+    assert len(body) == 2
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_jars_transactions_limit_below_one_is_rejected(limit):
+    status, body = call("GET", f"/jars?transactions_limit={limit}")
+    assert status == 400
+    assert body["detail"]["error"] == "InvalidLimit"
+
+
+def test_jars_transactions_limit():
+    status, body = call("GET", "/jars?transactions_limit=1")
+    assert status == 200
+    assert all(len(jar["transactions"]) <= 1 for jar in body)
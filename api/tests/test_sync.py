@@ -0,0 +1,26 @@
+import sqlite3
+
+import database
+from conftest import call
+from storage import _sqlite_path
+
+
+def test_sync_after_another_worker_commits_is_a_snapshot(tmp_path, monkeypatch):
+    url = f"sqlite:{tmp_path / 'family.db'}"
+    monkeypatch.setattr(database, "storage_url", url)
+    database.create_family(51)
+    status, first = call("GET", "/sync", family=51)
+    assert status == 200 and first["snapshot"]
+    status, unchanged = call("GET", f"/sync?since={first['seq']}", family=51)
+    assert status == 200 and not unchanged["snapshot"]
+
+    #Another worker commits through its own connection
+    connection = sqlite3.connect(_sqlite_path(url, 51))
+    connection.execute("UPDATE meta SET value = 250.0 WHERE key = 'budget'")
+    connection.commit()
+    connection.close()
+
+    status, after = call("GET", f"/sync?since={unchanged['seq']}", family=51)
+    assert status == 200
+    assert after["snapshot"]
+    assert after["budget"] == {"amount": 250.0}
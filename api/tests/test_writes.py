@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+import database
+from app import app
+from benchmarks.asgi import request
+
+
+def test_slow_body_does_not_hold_the_write_lock():
+    body = json.dumps({"amount": 5, "isIncome": True, "dtype": "Work"}).encode()
+    arrived = asyncio.Event()
+    statuses = []
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/transactions/add", "raw_path": b"/transactions/add", "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"test"), (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 0), "server": ("test", 80),
+    }
+    parts = [body[:5], body[5:]]
+
+    async def receive():
+        if not parts:
+            await asyncio.Event().wait()
+        if len(parts) == 1:
+            await arrived.wait()
+        chunk = parts.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(parts)}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    async def run():
+        slow = asyncio.create_task(app(scope, receive, send))
+        await asyncio.sleep(0.1)
+        assert not database.get_family(1).write_lock.locked()
+        #Another write goes through while the first body is still on its way
+        status, _ = await asyncio.wait_for(request(app, "POST", "/transactions/add", {"amount": 1, "isIncome": True, "dtype": "Work"}), 1)
+        assert status == 200
+        arrived.set()
+        await asyncio.wait_for(slow, 1)
+
+    asyncio.run(run())
+    assert statuses == [200]
@@ -0,0 +1,101 @@
+import codecs
+import csv
+import io
+
+import orjson
+
+#Bulk import/export formats: CSV with a header row, or one JSON object per line
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def pick_format(format: str | None, content_type: str | None) -> str | None:
+    #Explicit ?format= first, then the Content-Type of the upload, CSV when neither says
+    if format is not None:
+        return format if format in FORMATS else None
+    if content_type and "ndjson" in content_type:
+        return "ndjson"
+    return "csv"
+
+
+async def read_lines(chunks):
+    #Complete lines of a streamed utf-8 body, whatever the chunk boundaries
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    rest = ""
+    async for chunk in chunks:
+        rest += decoder.decode(chunk)
+        *lines, rest = rest.split("\n")
+        for line in lines:
+            yield line
+    rest += decoder.decode(b"", final=True)
+    if rest:
+        yield rest
+
+
+async def read_records(chunks, format: str):
+    #(record number, dict or ValueError) per non-empty record, 1 = the first record after
+    #any CSV header. Quoted CSV fields may span lines.
+    number = 0
+    header = None
+    pending = ""
+    async for line in read_lines(chunks):
+        if format == "ndjson":
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                yield number, ValueError(f"not valid JSON ({e})")
+                continue
+            yield number, record if isinstance(record, dict) else ValueError("not a JSON object")
+            continue
+
+        pending = f"{pending}\n{line}" if pending else line
+        if pending.count('"') % 2:
+            continue
+        text, pending = pending.rstrip("\r"), ""
+        if not text.strip():
+            continue
+        try:
+            row = next(csv.reader([text]))
+        except csv.Error as e:
+            row = e
+        if header is None:
+            header = row if isinstance(row, list) else []
+            continue
+        number += 1
+        if not isinstance(row, list):
+            yield number, ValueError(f"not valid CSV ({row})")
+        elif len(row) != len(header):
+            yield number, ValueError(f"expected {len(header)} fields, got {len(row)}")
+        else:
+            yield number, dict(zip(header, row))
+    if pending:
+        yield number + 1, ValueError("unterminated quoted field")
+
+
+def write_records(rows, fields: tuple[str, ...], format: str, batch: int = 500):
+    #Encoded chunks of about batch rows each, rows is consumed lazily
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if format == "csv":
+        writer.writerow(fields)
+    chunk = []
+    for row in rows:
+        if format == "csv":
+            writer.writerow(["" if row[field] is None else row[field] for field in fields])
+        else:
+            chunk.append(orjson.dumps({field: row[field] for field in fields}))
+            chunk.append(b"\n")
+        if len(chunk) >= 2 * batch or buffer.tell() >= 64 * batch:
+            yield flush(buffer, chunk)
+    if chunk or buffer.tell():
+        yield flush(buffer, chunk)
+
+
+def flush(buffer: io.StringIO, chunk: list[bytes]) -> bytes:
+    data = buffer.getvalue().encode() + b"".join(chunk)
+    buffer.seek(0)
+    buffer.truncate()
+    chunk.clear()
+    return data